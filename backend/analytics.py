@@ -0,0 +1,114 @@
+import numpy as np
+
+SECONDS_PER_YEAR = 365.25 * 86400
+
+def unrealised_pnl(quantities: np.ndarray, purchase_prices: np.ndarray, current_prices: np.ndarray) -> dict:
+    """Cost basis, market value and unrealised P&L per position (NaN price = unpriced)"""
+    cost_basis = quantities * purchase_prices
+    market_value = quantities * current_prices
+    pnl = market_value - cost_basis
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pnl_pct = np.where(cost_basis > 0, pnl / cost_basis * 100, np.nan)
+    return {
+        "cost_basis": cost_basis,
+        "market_value": market_value,
+        "pnl": pnl,
+        "pnl_pct": pnl_pct
+    }
+
+def allocation(values: np.ndarray) -> np.ndarray:
+    """Percentage share of each value in the total"""
+    total = values.sum()
+    return values / total * 100 if total > 0 else np.zeros_like(values)
+
+def period_flows(timestamps: np.ndarray, flow_times: np.ndarray, flow_amounts: np.ndarray) -> np.ndarray:
+    """Sum of flows falling in each period (timestamps[i-1], timestamps[i]]; index 0 is always 0"""
+    period = np.searchsorted(timestamps, flow_times, side='left')
+    inside = (period > 0) & (period < len(timestamps))
+    return np.bincount(period[inside], weights=flow_amounts[inside], minlength=len(timestamps))
+
+def time_weighted_return(values: np.ndarray, flows: np.ndarray) -> float:
+    """Chain-linked return of a value series, neutralising external flows.
+
+    flows[i] is the net amount added during period i and is assumed to arrive
+    at its start, so each sub-period return is values[i] / (values[i-1] + flows[i]).
+    Periods starting from a non-positive base are skipped.
+    """
+    if len(values) < 2:
+        return float('nan')
+    base = values[:-1] + flows[1:]
+    valid = base > 0
+    growth = values[1:][valid] / base[valid]
+    return float(np.prod(growth) - 1)
+
+def money_weighted_return(times: np.ndarray, amounts: np.ndarray, iterations: int = 100, tolerance: float = 1e-10) -> float:
+    """Annualised internal rate of return of dated cash flows.
+
+    times are in years from the first flow and amounts follow the investor's
+    sign convention (contributions negative, final value positive). Solved with
+    Newton's method, falling back to bisection when it leaves the domain.
+    """
+    if len(amounts) < 2 or times[-1] <= 0 or not (np.any(amounts > 0) and np.any(amounts < 0)):
+        return float('nan')
+
+    def npv(rate):
+        discount = (1 + rate) ** -times
+        return np.dot(amounts, discount), np.dot(-times * amounts, discount / (1 + rate))
+
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        rate = 0.1
+        for _ in range(iterations):
+            value, slope = npv(rate)
+            if abs(value) < tolerance:
+                return float(rate)
+            if slope == 0:
+                break
+            step = rate - value / slope
+            if not np.isfinite(step) or step <= -1:
+                break
+            if abs(step - rate) < tolerance:
+                return float(step)
+            rate = step
+
+        low, high = -0.9999, 1.0
+        while npv(high)[0] > 0 and high < 1e6:
+            high *= 2
+        low_value = npv(low)[0]
+        if low_value * npv(high)[0] > 0:
+            return float('nan')
+        for _ in range(200):
+            mid = (low + high) / 2
+            mid_value = npv(mid)[0]
+            if low_value * mid_value <= 0:
+                high = mid
+            else:
+                low, low_value = mid, mid_value
+            if high - low < tolerance:
+                break
+        return float((low + high) / 2)
+
+def performance(timestamps: np.ndarray, values: np.ndarray, flow_times: np.ndarray, flow_amounts: np.ndarray) -> dict:
+    """Time- and money-weighted returns of a snapshot series with external flows.
+
+    timestamps are ascending epoch seconds, values the portfolio value at each
+    snapshot and flow_times/flow_amounts the dated contributions (positive
+    when money is added).
+    """
+    if len(values) < 2:
+        return {"time_weighted_return_pct": None, "money_weighted_return_pct": None}
+
+    flows = period_flows(timestamps, flow_times, flow_amounts)
+    twr = time_weighted_return(values, flows)
+
+    years = (timestamps - timestamps[0]) / SECONDS_PER_YEAR
+    amounts = -flows
+    amounts[0] -= values[0]
+    amounts[-1] += values[-1]
+    # Only dated flows matter to the IRR, not every snapshot in between
+    dated = amounts != 0
+    mwr = money_weighted_return(years[dated], amounts[dated])
+
+    return {
+        "time_weighted_return_pct": None if np.isnan(twr) else twr * 100,
+        "money_weighted_return_pct": None if np.isnan(mwr) else mwr * 100
+    }
@@ -8,10 +8,19 @@ from typing import Optional
 import logging
 import bcrypt
 import secrets
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from database import User as DBUser, UserSession as DBUserSession
+from cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# In-process cache of authenticated sessions: session_token -> User.
+# Entries never outlive the session; logout invalidates them explicitly.
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL_SECONDS', '300'))
+session_cache = TTLCache(maxsize=int(os.environ.get('SESSION_CACHE_SIZE', '10000')), ttl=SESSION_CACHE_TTL)
+
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
     user_id: str
@@ -29,47 +38,81 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+# bcrypt runs in a dedicated thread pool (bcrypt releases the GIL while hashing),
+# so logins use every core and never stall the event loop
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_POOL_SIZE = int(os.environ.get('PASSWORD_POOL_SIZE', str(os.cpu_count() or 2)))
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_POOL_SIZE, thread_name_prefix='bcrypt')
+_password_jobs = 0
+
+async def _run_password_job(func, *args):
+    global _password_jobs
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_pool, func, *args)
+    finally:
+        _password_jobs -= 1
+
+def password_pool_stats() -> dict:
+    """Pool size, jobs queued or running, and configured bcrypt cost"""
+    return {
+        "workers": PASSWORD_POOL_SIZE,
+        "queue_depth": _password_jobs,
+        "rounds": BCRYPT_ROUNDS
+    }
+
+def _hashpw(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify a password against its hash"""
+def _checkpw(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-async def create_user(signup_data: UserSignup, db: AsyncSession) -> User:
-    """Create a new user with email and password"""
-    # Check if user already exists
-    result = await db.execute(select(DBUser).where(DBUser.email == signup_data.email))
-    existing_user = result.scalar_one_or_none()
-    
-    if existing_user:
+async def hash_password(password: str) -> str:
+    """Hash a password using bcrypt"""
+    return await _run_password_job(_hashpw, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Verify a password against its hash"""
+    return await _run_password_job(_checkpw, password, hashed)
+
+def new_session(user_id: str) -> DBUserSession:
+    """Build a 7-day session with a fresh random token"""
+    now = datetime.now(timezone.utc)
+    return DBUserSession(
+        user_id=user_id,
+        session_token=secrets.token_urlsafe(32),
+        expires_at=now + timedelta(days=7),
+        created_at=now
+    )
+
+async def create_user_with_session(signup_data: UserSignup, db: AsyncSession) -> dict:
+    """Create a user and log them in within one transaction, hashing the password once"""
+    result = await db.execute(select(DBUser.id).where(DBUser.email == signup_data.email))
+    if result.scalar_one_or_none() is not None:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create new user
-    user_id = f"user_{uuid.uuid4().hex[:12]}"
-    password_hash = hash_password(signup_data.password)
-    
-    new_user = DBUser(
-        user_id=user_id,
+    user = User(
+        user_id=f"user_{uuid.uuid4().hex[:12]}",
         email=signup_data.email,
         name=signup_data.name,
-        password_hash=password_hash,
+        picture=None,
         created_at=datetime.now(timezone.utc)
     )
+    session = new_session(user.user_id)
     
-    db.add(new_user)
+    db.add(DBUser(
+        user_id=user.user_id,
+        email=user.email,
+        name=user.name,
+        password_hash=await hash_password(signup_data.password),
+        created_at=user.created_at
+    ))
+    db.add(session)
     await db.commit()
-    await db.refresh(new_user)
-    
-    return User(
-        user_id=new_user.user_id,
-        email=new_user.email,
-        name=new_user.name,
-        picture=new_user.picture,
-        created_at=new_user.created_at
-    )
+    
+    session_cache.set(session.session_token, user)
+    return {"user": user.model_dump(), "session_token": session.session_token}
 
 async def authenticate_user(login_data: UserLogin, db: AsyncSession) -> dict:
     """Authenticate user with email and password"""
@@ -81,19 +124,12 @@ async def authenticate_user(login_data: UserLogin, db: AsyncSession) -> dict:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not verify_password(login_data.password, user.password_hash):
+    if not await verify_password(login_data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Create session token
-    session_token = secrets.token_urlsafe(32)
-    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-    
-    session = DBUserSession(
-        user_id=user.user_id,
-        session_token=session_token,
-        expires_at=expires_at,
-        created_at=datetime.now(timezone.utc)
-    )
+    session = new_session(user.user_id)
+    session_token = session.session_token
     
     db.add(session)
     await db.commit()
@@ -123,31 +159,33 @@ async def get_current_user(request: Request, db: AsyncSession) -> User:
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Find session
+    cached_user = session_cache.lookup(session_token)
+    if cached_user is not None:
+        return cached_user
+    
+    # Find session and its user in one query
     result = await db.execute(
-        select(DBUserSession).where(DBUserSession.session_token == session_token)
+        select(DBUserSession, DBUser)
+        .outerjoin(DBUser, DBUser.user_id == DBUserSession.user_id)
+        .where(DBUserSession.session_token == session_token)
     )
-    session = result.scalar_one_or_none()
+    row = result.first()
     
-    if not session:
+    if not row:
         raise HTTPException(status_code=401, detail="Invalid session")
+    session, user = row
     
     # Check expiry
     expires_at = session.expires_at
     if expires_at.tzinfo is None:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
     
-    if expires_at < datetime.now(timezone.utc):
+    now = datetime.now(timezone.utc)
+    if expires_at < now:
         await db.delete(session)
         await db.commit()
         raise HTTPException(status_code=401, detail="Session expired")
     
-    # Get user
-    result = await db.execute(
-        select(DBUser).where(DBUser.user_id == session.user_id)
-    )
-    user = result.scalar_one_or_none()
-    
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -156,16 +194,19 @@ async def get_current_user(request: Request, db: AsyncSession) -> User:
     if created_at.tzinfo is None:
         created_at = created_at.replace(tzinfo=timezone.utc)
     
-    return User(
+    current_user = User(
         user_id=user.user_id,
         email=user.email,
         name=user.name,
         picture=user.picture,
         created_at=created_at
     )
+    session_cache.set(session_token, current_user, min(SESSION_CACHE_TTL, (expires_at - now).total_seconds()))
+    return current_user
 
 async def logout_user(session_token: str, db: AsyncSession):
     """Delete user session"""
+    session_cache.invalidate(session_token)
     result = await db.execute(
         select(DBUserSession).where(DBUserSession.session_token == session_token)
     )
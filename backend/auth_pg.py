@@ -2,12 +2,13 @@ from fastapi import HTTPException, Request, Response
 from datetime import datetime, timezone, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-import requests
+import httpx
 import uuid
 from pydantic import BaseModel
 from typing import Optional
 import logging
 from database import User as DBUser, UserSession as DBUserSession
+from http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,7 @@ class User(BaseModel):
 async def exchange_session_id(session_id: str, db: AsyncSession) -> dict:
     """Exchange session_id for user data and session_token from Emergent Auth"""
     try:
-        response = requests.get(
+        response = await get_http_client().get(
             'https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data',
             headers={'X-Session-ID': session_id},
             timeout=10
@@ -78,7 +79,7 @@ async def exchange_session_id(session_id: str, db: AsyncSession) -> dict:
             "session_token": session_token
         }
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error exchanging session_id: {e}")
         raise HTTPException(status_code=500, detail="Authentication service error")
 
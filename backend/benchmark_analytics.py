@@ -0,0 +1,64 @@
+"""
+Benchmark: portfolio analytics against the number of snapshots
+Times the vectorised time-weighted return next to a per-row Python loop
+computing the same value, and the full analytics.performance (time- and
+money-weighted returns), on synthetic snapshot series of growing size
+
+Usage: python benchmark_analytics.py [max_snapshots]
+"""
+import sys
+import time
+import numpy as np
+
+from analytics import performance, period_flows, time_weighted_return
+
+def synthetic_history(size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    timestamps = 1.7e9 + np.arange(size, dtype=np.float64) * 3600
+    values = 10000 * np.cumprod(1 + rng.normal(0.0001, 0.01, size))
+    flow_count = max(1, size // 100)
+    flow_times = np.sort(rng.uniform(timestamps[0], timestamps[-1], flow_count))
+    flow_amounts = rng.uniform(100, 1000, flow_count)
+    return timestamps, values, flow_times, flow_amounts
+
+def loop_time_weighted_return(timestamps, values, flow_times, flow_amounts):
+    growth = 1.0
+    f = 0
+    for i in range(1, len(values)):
+        flow = 0.0
+        while f < len(flow_times) and flow_times[f] <= timestamps[i]:
+            if flow_times[f] > timestamps[i - 1]:
+                flow += flow_amounts[f]
+            f += 1
+        base = values[i - 1] + flow
+        if base > 0:
+            growth *= values[i] / base
+    return growth - 1
+
+def numpy_time_weighted_return(timestamps, values, flow_times, flow_amounts):
+    return time_weighted_return(values, period_flows(timestamps, flow_times, flow_amounts))
+
+def best_of(func, *args, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main(max_snapshots: int):
+    print(f"{'snapshots':>10} {'twr numpy ms':>13} {'twr loop ms':>12} {'speedup':>8} {'twr+mwr ms':>11}")
+    size = 100
+    while size <= max_snapshots:
+        history = synthetic_history(size)
+        numpy_time = best_of(numpy_time_weighted_return, *history)
+        loop_time = best_of(loop_time_weighted_return, *[a.tolist() for a in history])
+        full_time = best_of(performance, *history)
+        print(
+            f"{size:>10} {numpy_time * 1000:>13.2f} {loop_time * 1000:>12.2f}"
+            f" {loop_time / numpy_time:>7.1f}x {full_time * 1000:>11.2f}"
+        )
+        size *= 10
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,70 @@
+"""
+Benchmark: price resolution against fake providers, without network access
+Registers a FakePriceProvider for every source, then runs rounds of
+resolve_prices over a synthetic set of held keys with the price cache
+cleared between rounds, and reports latency percentiles, throughput,
+upstream calls and timeouts for growing numbers of concurrent requests
+
+Usage: python benchmark_prices.py [keys] [latency_ms] [error_rate]
+"""
+import asyncio
+import sys
+import time
+import numpy as np
+
+from price_providers import FakePriceProvider, PRICE_SOURCES, price_providers
+from prices import price_cache, resolve_prices
+
+ROUNDS = 20
+
+def synthetic_keys(count: int) -> list:
+    keys = []
+    for i in range(count):
+        source = PRICE_SOURCES[i % len(PRICE_SOURCES)]
+        if source == 'coin':
+            keys.append(('coin', f'https://example.com/coin/{i}', '.price'))
+        else:
+            keys.append((source, f'SYM{i}'))
+    return keys
+
+async def run(keys: list, concurrency: int):
+    latencies, timeouts = [], 0
+    for _ in range(ROUNDS):
+        price_cache.clear()
+        requests = [{i: key for i, key in enumerate(keys) if i % concurrency == c} for c in range(concurrency)]
+
+        async def timed(request):
+            start = time.perf_counter()
+            _, timed_out = await resolve_prices(request)
+            latencies.append(time.perf_counter() - start)
+            return len(timed_out)
+
+        timeouts += sum(await asyncio.gather(*[timed(r) for r in requests]))
+    return np.array(latencies), timeouts
+
+async def main(key_count: int, latency_ms: float, error_rate: float):
+    keys = synthetic_keys(key_count)
+    providers = {source: FakePriceProvider(latency_ms=latency_ms, error_rate=error_rate, seed=0) for source in PRICE_SOURCES}
+    for source, provider in providers.items():
+        price_providers.register(source, provider)
+
+    print(f"{key_count} keys, {latency_ms:g} ms median provider latency, {error_rate:.0%} errors, {ROUNDS} rounds")
+    print(f"{'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'calls':>7} {'timeouts':>9}")
+    for concurrency in (1, 10, 100):
+        calls_before = sum(p.calls for p in providers.values())
+        start = time.perf_counter()
+        latencies, timeouts = await run(keys, concurrency)
+        elapsed = time.perf_counter() - start
+        calls = sum(p.calls for p in providers.values()) - calls_before
+        p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+        print(
+            f"{concurrency:>9} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}"
+            f" {len(latencies) / elapsed:>8.1f} {calls:>7} {timeouts:>9}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 50,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    ))
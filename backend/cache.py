@@ -0,0 +1,129 @@
+from collections import OrderedDict
+import asyncio
+import time
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and single-flight loading"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> asyncio.Task
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return a fresh cached value, or default if missing/expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def lookup(self, key):
+        """get() for callers that load misses themselves, counted in the hit/miss stats"""
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        """Store a value, evicting the least recently used entries when full"""
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_load(self, key, loader, ttl: float = None):
+        """Return the cached value or load it, sharing one load between concurrent callers.
+
+        The load runs in its own task so a cancelled caller does not abort the
+        upstream call other callers are waiting on. None results are not cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader, ttl))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader, ttl):
+        try:
+            value = await loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def load_many(self, keys, loader, ttl: float = None) -> tuple:
+        """Split keys into (cached values, loading tasks), loading the misses with one batch call.
+
+        Keys not cached and not already loading are passed together to
+        loader(keys), which returns {key: value}. Every pending key gets a
+        task shared with concurrent callers, as in get_or_load; the tasks run
+        to completion even when callers stop waiting. None results are not cached.
+        """
+        values, tasks, missing = {}, {}, []
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                values[key] = value
+            elif key in self._inflight:
+                tasks[key] = self._inflight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            self.misses += len(missing)
+            batch = asyncio.ensure_future(self._load_batch(missing, loader, ttl))
+            for key in missing:
+                tasks[key] = self._inflight[key] = asyncio.ensure_future(self._batch_value(batch, key))
+        return values, tasks
+
+    async def _load_batch(self, keys, loader, ttl):
+        values = await loader(keys)
+        for key, value in values.items():
+            if value is not None:
+                self.set(key, value, ttl)
+        return values
+
+    async def _batch_value(self, batch, key):
+        try:
+            return (await batch).get(key)
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight": len(self._inflight)
+        }
@@ -0,0 +1,153 @@
+from typing import Optional
+from urllib.parse import urlsplit
+import asyncio
+import functools
+import logging
+import os
+import re
+import time
+
+from cache import TTLCache
+from http_client import get_http_client, run_blocking
+from sdk_loader import sdks
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+SCRAPER_HOST_INTERVAL = float(os.environ.get('SCRAPER_HOST_INTERVAL_SECONDS', '1'))
+SCRAPER_MAX_PAGES = int(os.environ.get('SCRAPER_MAX_PAGES', '256'))
+SCRAPER_PAGE_TTL = float(os.environ.get('SCRAPER_PAGE_TTL_SECONDS', '86400'))
+
+PRICE_PATTERN = re.compile(r'(\d+\.?\d*)')
+
+# HTML parsing libraries, imported on the first scrape
+bs4_sdk = sdks.register('bs4', 'bs4')
+soupsieve_sdk = sdks.register('soupsieve', 'soupsieve')
+
+@functools.lru_cache(maxsize=1024)
+def compile_selector(css_selector: str):
+    soupsieve = soupsieve_sdk.get()
+    if soupsieve is None:
+        raise RuntimeError("soupsieve unavailable")
+    return soupsieve.compile(css_selector)
+
+def parse_price_text(text: str) -> Optional[float]:
+    price_text = text.strip().replace('€', '').replace(',', '.').replace(' ', '')
+    match = PRICE_PATTERN.search(price_text)
+    if match:
+        return float(match.group(1))
+    return None
+
+def extract_prices(content: bytes, css_selectors) -> dict:
+    """Parse a page once and extract a price for each selector; an invalid selector only fails itself"""
+    bs4 = bs4_sdk.get()
+    if bs4 is None:
+        raise RuntimeError("bs4 unavailable")
+    soup = bs4.BeautifulSoup(content, HTML_PARSER)
+    prices = {}
+    for css_selector in css_selectors:
+        try:
+            element = compile_selector(css_selector).select_one(soup)
+        except RuntimeError:
+            # soupsieve itself is unavailable: fail the batch so nothing is stored
+            raise
+        except Exception as e:
+            logger.warning(f"Invalid CSS selector {css_selector!r}: {e}")
+            element = None
+        prices[css_selector] = parse_price_text(element.get_text()) if element else None
+    return prices
+
+class PageEntry:
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], content: bytes):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content = content
+        self.prices = {}  # css_selector -> parsed price for this content
+
+class CoinScraper:
+    """Scrape coin prices with one download per page, conditional requests and per-host rate limits.
+
+    Pages are downloaded once per URL no matter how many selectors or users
+    reference them; unchanged pages (304) reuse the already parsed prices.
+    """
+
+    def __init__(self, host_interval: float = SCRAPER_HOST_INTERVAL):
+        self.host_interval = host_interval
+        self.pages = TTLCache(maxsize=SCRAPER_MAX_PAGES, ttl=SCRAPER_PAGE_TTL)
+        self._inflight = {}  # url -> asyncio.Task
+        self._host_locks = {}
+        self._host_last_request = {}
+        self.not_modified = 0
+        self.downloads = 0
+        self.parses = 0
+
+    async def _wait_for_host(self, host: str):
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._host_last_request.get(host, 0.0) + self.host_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_last_request[host] = time.monotonic()
+
+    async def _download(self, url: str) -> Optional[PageEntry]:
+        cached = self.pages.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        await self._wait_for_host(urlsplit(url).netloc)
+        response = await get_http_client().get(url, headers=headers, timeout=10)
+        if response.status_code == 304 and cached is not None:
+            self.not_modified += 1
+            self.pages.set(url, cached)
+            return cached
+        if response.status_code >= 400:
+            return None
+
+        self.downloads += 1
+        entry = PageEntry(response.headers.get('ETag'), response.headers.get('Last-Modified'), response.content)
+        self.pages.set(url, entry)
+        return entry
+
+    async def fetch_page(self, url: str) -> Optional[PageEntry]:
+        """Return the current page, sharing one download between concurrent callers"""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._download(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def get_prices(self, url: str, css_selectors) -> dict:
+        """Prices of several selectors on one page, parsing each page version at most once per batch"""
+        entry = await self.fetch_page(url)
+        if entry is None:
+            return {css_selector: None for css_selector in css_selectors}
+        missing = [css_selector for css_selector in css_selectors if css_selector not in entry.prices]
+        if missing:
+            self.parses += 1
+            parsed = await run_blocking(extract_prices, entry.content, missing)
+            entry.prices.update(parsed)
+        return {css_selector: entry.prices[css_selector] for css_selector in css_selectors}
+
+    async def get_price(self, url: str, css_selector: str) -> Optional[float]:
+        return (await self.get_prices(url, [css_selector]))[css_selector]
+
+    def stats(self) -> dict:
+        return {
+            "pages": len(self.pages),
+            "downloads": self.downloads,
+            "not_modified": self.not_modified,
+            "parses": self.parses,
+            "parser": HTML_PARSER
+        }
+
+coin_scraper = CoinScraper()
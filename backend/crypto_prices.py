@@ -0,0 +1,97 @@
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+from http_client import run_blocking
+from sdk_loader import sdks
+
+logger = logging.getLogger(__name__)
+
+binance_api_key = os.environ.get('BINANCE_API_KEY', 'BtXraKHkudYowil8u1ez4SYjg8BZFiWBflZKmc7P7zqngPJ4uqQXpV2nujCAX0ia')
+
+# Importing python-binance and creating the Client (which pings the API) is deferred to first use
+binance_sdk = sdks.register(
+    'binance', 'binance.client',
+    lambda module: module.Client(binance_api_key, '', testnet=False)
+)
+
+def get_binance_client():
+    return binance_sdk.get()
+
+CRYPTO_TICKER_TTL = float(os.environ.get('CRYPTO_TICKER_TTL_SECONDS', '15'))
+# Past this age a snapshot is no longer served, even while refreshes keep failing
+CRYPTO_TICKER_MAX_STALENESS = float(os.environ.get('CRYPTO_TICKER_MAX_STALENESS_SECONDS', str(CRYPTO_TICKER_TTL * 4)))
+
+# Quote assets treated as USD, in order of preference, then cross pairs priced via their own USD pair
+USD_QUOTES = ('USDT', 'USDC', 'FDUSD', 'BUSD')
+CROSS_QUOTES = ('BTC', 'ETH', 'BNB')
+
+def usd_price(prices: dict, symbol: str) -> Optional[float]:
+    """Price a base asset in USD from a {pair: price} ticker table"""
+    if symbol in USD_QUOTES:
+        return 1.0
+    for quote in USD_QUOTES:
+        price = prices.get(f"{symbol}{quote}")
+        if price is not None:
+            return price
+    for cross in CROSS_QUOTES:
+        price = prices.get(f"{symbol}{cross}")
+        if price is not None and cross != symbol:
+            cross_usd = next((prices[f"{cross}{quote}"] for quote in USD_QUOTES if f"{cross}{quote}" in prices), None)
+            if cross_usd is not None:
+                return price * cross_usd
+    return None
+
+class BinanceTickerBook:
+    """Snapshot of every Binance spot ticker, fetched in a single call and indexed by pair"""
+
+    def __init__(self, ttl: float = CRYPTO_TICKER_TTL, max_staleness: float = CRYPTO_TICKER_MAX_STALENESS):
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self._prices: dict = {}
+        self._fetched_at = 0.0  # when the current snapshot was fetched
+        self._attempted_at = 0.0  # last refresh attempt, successful or not
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _fetch(self) -> dict:
+        client = await run_blocking(get_binance_client)
+        if client is None:
+            raise RuntimeError("Binance client unavailable")
+        tickers = await run_blocking(client.get_symbol_ticker)
+        return {t['symbol']: float(t['price']) for t in tickers}
+
+    async def _refresh(self):
+        try:
+            self._prices = await self._fetch()
+            self._fetched_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Binance ticker refresh failed: {e}")
+        finally:
+            # Failed refreshes also wait a full interval so an outage is not hammered
+            self._attempted_at = time.monotonic()
+            self._refresh_task = None
+
+    async def snapshot(self) -> dict:
+        """Return the ticker table, refreshing it once per interval for all callers.
+
+        A snapshot older than max_staleness (refreshes failing meanwhile) is
+        dropped, so prices come back as None instead of stale values.
+        """
+        if time.monotonic() - self._attempted_at >= self.ttl:
+            if self._refresh_task is None:
+                self._refresh_task = asyncio.ensure_future(self._refresh())
+            await asyncio.shield(self._refresh_task)
+        if time.monotonic() - self._fetched_at >= self.max_staleness:
+            return {}
+        return self._prices
+
+    async def get_usd_price(self, symbol: str) -> Optional[float]:
+        return usd_price(await self.snapshot(), symbol.upper())
+
+    async def get_usd_prices(self, symbols) -> dict:
+        prices = await self.snapshot()
+        return {symbol: usd_price(prices, symbol.upper()) for symbol in symbols}
+
+crypto_tickers = BinanceTickerBook()
@@ -1,7 +1,8 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Float, DateTime, Text
-from datetime import datetime, timezone
+from sqlalchemy import String, Float, DateTime, Text, Index, Date, Integer, LargeBinary, UniqueConstraint, event
+from datetime import datetime, date, timezone
+from typing import Optional
 import os
 
 # Database URL from environment
@@ -26,8 +27,55 @@ elif DATABASE_URL.startswith('postgresql://') and 'asyncpg' not in DATABASE_URL:
     # PostgreSQL without asyncpg: add it
     DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://', 1)
 
+# Connection pool (aiomysql, asyncpg and file-backed SQLite)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT_SECONDS', '30'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE_SECONDS', '1800'))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# asyncpg prepared statements cached per connection (0 when behind pgbouncer in transaction mode)
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', '500'))
+
+# SQLite: WAL lets readers run alongside the writer; busy_timeout waits for locks instead of failing
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+def engine_options(url: str) -> dict:
+    """Backend-specific create_async_engine arguments"""
+    options = {"echo": False}
+    in_memory_sqlite = url.startswith('sqlite') and (':memory:' in url or url.endswith(':///'))
+    if not in_memory_sqlite:
+        # In-memory SQLite uses a single shared connection (StaticPool) without these knobs
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING
+        )
+    if url.startswith('sqlite'):
+        options["connect_args"] = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    elif url.startswith('postgresql+asyncpg'):
+        options["connect_args"] = {
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE
+        }
+    return options
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
 # Create async engine
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+if DATABASE_URL.startswith('sqlite'):
+    event.listen(engine.sync_engine, "connect", apply_sqlite_pragmas)
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 # Base class for models
@@ -52,7 +100,7 @@ class UserSession(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[str] = mapped_column(String(100), index=True)
     session_token: Mapped[str] = mapped_column(String(500), unique=True, index=True)
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 class CryptoAsset(Base):
@@ -93,6 +141,9 @@ class CoinAsset(Base):
 
 class HistorySnapshot(Base):
     __tablename__ = 'history_snapshots'
+    __table_args__ = (
+        Index('ix_history_snapshots_user_id_timestamp', 'user_id', 'timestamp'),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     snapshot_id: Mapped[str] = mapped_column(String(100), unique=True, index=True)
@@ -103,6 +154,42 @@ class HistorySnapshot(Base):
     stocks_value_eur: Mapped[float] = mapped_column(Float)
     coins_value_eur: Mapped[float] = mapped_column(Float)
 
+class ClosedPosition(Base):
+    """A deleted crypto or stock holding, kept as the external flows it represents.
+
+    cost_eur entered the portfolio at opened_at and proceeds_eur (quantity x
+    price at deletion, None when no price was available) left it at closed_at.
+    """
+    __tablename__ = 'closed_positions'
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(100), index=True)
+    asset_class: Mapped[str] = mapped_column(String(20))
+    asset_id: Mapped[str] = mapped_column(String(100))
+    opened_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    closed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    cost_eur: Mapped[float] = mapped_column(Float)
+    proceeds_eur: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+class PriceSeries(Base):
+    """One day of price ticks for one price key, shared by all users.
+
+    Ticks are packed arrays: little-endian uint32 seconds since midnight UTC
+    and float64 EUR prices, appended in time order.
+    """
+    __tablename__ = 'price_series'
+    __table_args__ = (
+        UniqueConstraint('source', 'series_key', 'day', name='uq_price_series_source_key_day'),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    source: Mapped[str] = mapped_column(String(20))
+    series_key: Mapped[str] = mapped_column(String(100))
+    day: Mapped[date] = mapped_column(Date)
+    tick_count: Mapped[int] = mapped_column(Integer, default=0)
+    seconds: Mapped[bytes] = mapped_column(LargeBinary)
+    prices: Mapped[bytes] = mapped_column(LargeBinary)
+
 # Dependency to get database session
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,57 @@
+import numpy as np
+
+BUCKET_SECONDS = {
+    'hour': 3600,
+    'day': 86400,
+}
+
+def bucket_ohlc(timestamps: np.ndarray, values: np.ndarray, bucket_seconds: int) -> dict:
+    """Group sorted samples into fixed time buckets.
+
+    timestamps are epoch seconds in ascending order and values is an (n, k)
+    array whose first column is the series summarised as open/high/low/close.
+    Returns bucket start times, OHLC of the first column and the last row of
+    values in each bucket.
+    """
+    buckets = np.floor_divide(timestamps, bucket_seconds).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    series = values[:, 0]
+    return {
+        "bucket_start": buckets[starts] * bucket_seconds,
+        "open": series[starts],
+        "high": np.maximum.reduceat(series, starts),
+        "low": np.minimum.reduceat(series, starts),
+        "close": series[ends],
+        "last": values[ends],
+    }
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of at most threshold points preserving the shape of y(x)"""
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    every = (size - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = size - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, size)
+        if next_start >= next_end:
+            next_start, next_end = size - 1, size
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
@@ -0,0 +1,105 @@
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+from http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+FX_RATES_URL = os.environ.get('FX_RATES_URL', 'https://api.exchangerate-api.com/v4/latest/EUR')
+FX_TTL = float(os.environ.get('FX_TTL_SECONDS', '3600'))
+FX_RETRY_INTERVAL = float(os.environ.get('FX_RETRY_SECONDS', '60'))
+
+# Quote currencies used by exchanges for minor units (e.g. LSE prices in pence)
+MINOR_UNITS = {
+    'GBP': ('GBP', 1.0),
+    'GBp': ('GBP', 0.01),
+    'GBX': ('GBP', 0.01),
+    'ZAc': ('ZAR', 0.01),
+    'ILA': ('ILS', 0.01),
+    'USDT': ('USD', 1.0),
+}
+
+def normalize_currency(currency: str):
+    """Return (ISO currency code, multiplier) for a quote currency"""
+    if currency in MINOR_UNITS:
+        return MINOR_UNITS[currency]
+    return currency.upper(), 1.0
+
+class FxRates:
+    """EUR-based rate table fetched in one call and cached with stale-while-revalidate.
+
+    A stale table is served while a refresh runs in the background; when a
+    refresh fails the last known good table stays in use.
+    """
+
+    def __init__(self, url: str = FX_RATES_URL, ttl: float = FX_TTL, retry_interval: float = FX_RETRY_INTERVAL):
+        self.url = url
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self._rates: Optional[dict] = None  # currency -> units per 1 EUR
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _fetch(self) -> dict:
+        response = await get_http_client().get(self.url, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        base = data.get('base', 'EUR')
+        rates = {code: float(rate) for code, rate in data['rates'].items() if rate}
+        if base != 'EUR':
+            eur = rates['EUR']
+            rates = {code: rate / eur for code, rate in rates.items()}
+        rates['EUR'] = 1.0
+        return rates
+
+    async def _refresh(self):
+        self._last_attempt = time.monotonic()
+        try:
+            self._rates = await self._fetch()
+            self._fetched_at = time.monotonic()
+        except Exception as e:
+            if self._rates is None:
+                logger.error(f"FX rates unavailable: {e}")
+            else:
+                logger.warning(f"FX refresh failed, keeping last known rates: {e}")
+        finally:
+            self._refresh_task = None
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+        return self._refresh_task
+
+    async def get_rates(self) -> Optional[dict]:
+        """Return the rate table, waiting only when no table has been loaded yet"""
+        now = time.monotonic()
+        can_retry = now - self._last_attempt >= self.retry_interval
+        if self._rates is None:
+            if can_retry or self._refresh_task is not None:
+                await asyncio.shield(self._start_refresh())
+        elif now - self._fetched_at >= self.ttl and can_retry:
+            self._start_refresh()
+        return self._rates
+
+    async def get_rate(self, from_currency: str, to_currency: str = 'EUR') -> Optional[float]:
+        """Return how many units of to_currency one unit of from_currency is worth"""
+        from_code, from_mult = normalize_currency(from_currency)
+        to_code, to_mult = normalize_currency(to_currency)
+        if from_code == to_code:
+            return from_mult / to_mult
+        rates = await self.get_rates()
+        if not rates or from_code not in rates or to_code not in rates:
+            return None
+        return rates[to_code] / rates[from_code] * from_mult / to_mult
+
+    async def convert(self, amount: float, from_currency: str, to_currency: str = 'EUR') -> Optional[float]:
+        rate = await self.get_rate(from_currency, to_currency)
+        if rate is None:
+            return None
+        return amount * rate
+
+fx_rates = FxRates()
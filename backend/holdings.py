@@ -0,0 +1,60 @@
+from typing import Optional
+from sqlalchemy import select, union_all, literal, null, String, Float
+
+from database import (
+    CryptoAsset as DBCryptoAsset,
+    StockAsset as DBStockAsset,
+    CoinAsset as DBCoinAsset
+)
+
+HOLDING_KEY_PREFIXES = {'crypto': 'crypto', 'stocks': 'stock', 'coins': 'coin'}
+
+def holdings_select(user_id: Optional[str] = None):
+    """UNION ALL of the three asset tables with an asset_class discriminator.
+
+    Every branch exposes the same columns; those a class does not have
+    (symbol for coins, url/css_selector for crypto and stocks, purchase_price
+    for coins) are NULL. Each branch filters on its table's user_id index.
+    """
+    def branch(model, asset_class, symbol, url, css_selector, purchase_price):
+        query = select(
+            literal(asset_class, String).label('asset_class'),
+            model.asset_id.label('asset_id'),
+            model.user_id.label('user_id'),
+            model.name.label('name'),
+            symbol.label('symbol'),
+            url.label('url'),
+            css_selector.label('css_selector'),
+            model.quantity.label('quantity'),
+            purchase_price.label('purchase_price'),
+            model.created_at.label('created_at')
+        )
+        if user_id is not None:
+            query = query.where(model.user_id == user_id)
+        return query
+
+    return union_all(
+        branch(DBCryptoAsset, 'crypto', DBCryptoAsset.symbol, null().cast(String), null().cast(String), DBCryptoAsset.purchase_price),
+        branch(DBStockAsset, 'stocks', DBStockAsset.symbol, null().cast(String), null().cast(String), DBStockAsset.purchase_price),
+        branch(DBCoinAsset, 'coins', null().cast(String), DBCoinAsset.url, DBCoinAsset.css_selector, null().cast(Float))
+    )
+
+async def load_holdings_rows(db, user_id: Optional[str] = None) -> list:
+    """All holdings (of one user, or of everyone) in a single query"""
+    result = await db.execute(holdings_select(user_id))
+    return result.all()
+
+def split_by_class(rows) -> tuple:
+    """Split unified rows into (cryptos, stocks, coins) lists"""
+    classes = {'crypto': [], 'stocks': [], 'coins': []}
+    for row in rows:
+        classes[row.asset_class].append(row)
+    return classes['crypto'], classes['stocks'], classes['coins']
+
+def row_holding_key(row) -> str:
+    return f"{HOLDING_KEY_PREFIXES[row.asset_class]}-{row.asset_id}"
+
+def row_price_key(row) -> tuple:
+    if row.asset_class == 'coins':
+        return ('coin', row.url, row.css_selector)
+    return (HOLDING_KEY_PREFIXES[row.asset_class], row.symbol.upper())
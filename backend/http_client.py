@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
+import functools
+import os
+import httpx
+
+# Shared async HTTP client: httpx keeps a keep-alive connection pool per upstream host
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT_SECONDS', '10'))
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.environ.get('HTTP_MAX_KEEPALIVE', '20'))
+
+# Bounded thread pool for blocking SDK calls (python-binance, yfinance) and HTML parsing
+BLOCKING_POOL_SIZE = int(os.environ.get('BLOCKING_POOL_SIZE', '8'))
+
+_client: Optional[httpx.AsyncClient] = None
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix='blocking')
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async HTTP client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30
+            ),
+            headers={'User-Agent': 'Mozilla/5.0'}
+        )
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable in the bounded thread pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
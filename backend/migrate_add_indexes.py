@@ -0,0 +1,32 @@
+"""
+Migration: Create indexes declared on the models
+create_all only adds indexes when it creates a table, so indexes added to
+existing tables (e.g. user_sessions.expires_at) are created here
+"""
+import asyncio
+from sqlalchemy import inspect
+
+from database import engine, Base
+
+def create_missing_indexes(sync_conn):
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            # New tables get their indexes from init_db's create_all
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            index.create(sync_conn)
+            print(f"✅ Created index '{index.name}' on {table.name}")
+
+async def migrate():
+    async with engine.begin() as conn:
+        await conn.run_sync(create_missing_indexes)
+
+    await engine.dispose()
+    print("✅ Migration completed successfully")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
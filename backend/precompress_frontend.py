@@ -0,0 +1,20 @@
+"""
+Build step: Precompress the frontend build
+Writes .gz (and .br when brotli is installed) next to each compressible
+file of frontend/build so the server can send them without compressing
+per request
+"""
+import sys
+from pathlib import Path
+
+from static_assets import precompress_tree
+
+BUILD_DIR = Path(__file__).parent.parent / "frontend" / "build"
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 else BUILD_DIR
+    if not (root / "index.html").exists():
+        print(f"⚠️  No frontend build at {root}, nothing to compress")
+        sys.exit(0)
+    written = precompress_tree(root)
+    print(f"✅ Wrote {written} precompressed files in {root}")
@@ -0,0 +1,152 @@
+from datetime import datetime, time as dtime, timezone
+from typing import Optional
+import asyncio
+import hashlib
+import logging
+import os
+import numpy as np
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, PriceSeries as DBPriceSeries
+from prices import add_price_listener, remove_price_listener
+
+logger = logging.getLogger(__name__)
+
+PRICE_HISTORY_ENABLED = os.environ.get('PRICE_HISTORY_ENABLED', 'true').lower() == 'true'
+PRICE_HISTORY_FLUSH_INTERVAL = float(os.environ.get('PRICE_HISTORY_FLUSH_SECONDS', '60'))
+
+SECONDS_DTYPE = np.dtype('<u4')
+PRICES_DTYPE = np.dtype('<f8')
+
+def series_id(price_key: tuple):
+    """Return (source, series_key) for a price key; coin keys are hashed to a fixed length"""
+    source = price_key[0]
+    if source == 'coin':
+        digest = hashlib.sha1(f"{price_key[1]}\n{price_key[2]}".encode()).hexdigest()
+        return source, digest
+    return source, price_key[1]
+
+def append_ticks(row: DBPriceSeries, seconds: np.ndarray, prices: np.ndarray):
+    row.seconds = (row.seconds or b'') + seconds.astype(SECONDS_DTYPE).tobytes()
+    row.prices = (row.prices or b'') + prices.astype(PRICES_DTYPE).tobytes()
+    row.tick_count = (row.tick_count or 0) + len(seconds)
+
+def unpack_ticks(row: DBPriceSeries):
+    """Return (epoch seconds, prices) arrays for a stored day"""
+    day_start = datetime.combine(row.day, dtime.min, tzinfo=timezone.utc).timestamp()
+    seconds = np.frombuffer(row.seconds, dtype=SECONDS_DTYPE).astype(np.float64) + day_start
+    return seconds, np.frombuffer(row.prices, dtype=PRICES_DTYPE)
+
+class PriceHistoryRecorder:
+    """Buffer price changes in memory and append them to the daily packed series.
+
+    Subscribes to refreshed price changes; each flush writes one row update
+    per (price key, day) touched since the last flush.
+    """
+
+    def __init__(self, flush_interval: float = PRICE_HISTORY_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.ticks_written = 0
+        self._buffer: dict = {}  # (source, series_key) -> list of (datetime, price)
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, price_key: tuple, price: float, at: datetime = None):
+        at = at or datetime.now(timezone.utc)
+        self._buffer.setdefault(series_id(price_key), []).append((at, price))
+
+    async def flush(self) -> int:
+        buffer, self._buffer = self._buffer, {}
+        if not buffer:
+            return 0
+
+        grouped = {}  # (source, series_key, day) -> list of (seconds of day, price)
+        for (source, series_key), ticks in buffer.items():
+            for at, price in ticks:
+                day_start = datetime.combine(at.date(), dtime.min, tzinfo=timezone.utc)
+                grouped.setdefault((source, series_key, at.date()), []).append(
+                    (int((at - day_start).total_seconds()), price)
+                )
+
+        try:
+            async with AsyncSessionLocal() as db:
+                for (source, series_key, day), ticks in grouped.items():
+                    result = await db.execute(
+                        select(DBPriceSeries).where(
+                            DBPriceSeries.source == source,
+                            DBPriceSeries.series_key == series_key,
+                            DBPriceSeries.day == day
+                        )
+                    )
+                    row = result.scalar_one_or_none()
+                    if row is None:
+                        row = DBPriceSeries(source=source, series_key=series_key, day=day)
+                        db.add(row)
+                    ticks_array = np.array(ticks, dtype=np.float64)
+                    append_ticks(row, ticks_array[:, 0], ticks_array[:, 1])
+                await db.commit()
+        except Exception:
+            # Keep the ticks for the next flush, e.g. when another worker created one of
+            # the day rows first or the database was unreachable or locked
+            for key, ticks in buffer.items():
+                self._buffer.setdefault(key, [])[:0] = ticks
+            raise
+
+        written = sum(len(ticks) for ticks in grouped.values())
+        self.ticks_written += written
+        return written
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Price history flush failed: {e}")
+
+    def _on_price_change(self, price_key: tuple, price: float):
+        self.record(price_key, price)
+
+    def start(self):
+        if self._task is None:
+            add_price_listener(self._on_price_change)
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            remove_price_listener(self._on_price_change)
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Final price history flush failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "ticks_written": self.ticks_written,
+            "buffered": sum(len(ticks) for ticks in self._buffer.values())
+        }
+
+async def load_price_history(db, price_key: tuple, start: datetime, end: datetime):
+    """Return (epoch seconds, prices) arrays for a price key within [start, end)"""
+    source, series_key = series_id(price_key)
+    result = await db.execute(
+        select(DBPriceSeries)
+        .where(
+            DBPriceSeries.source == source,
+            DBPriceSeries.series_key == series_key,
+            DBPriceSeries.day >= start.date(),
+            DBPriceSeries.day <= end.date()
+        )
+        .order_by(DBPriceSeries.day.asc())
+    )
+    days = [unpack_ticks(row) for row in result.scalars().all()]
+    if not days:
+        return np.empty(0), np.empty(0)
+    seconds = np.concatenate([d[0] for d in days])
+    prices = np.concatenate([d[1] for d in days])
+    in_range = (seconds >= start.timestamp()) & (seconds < end.timestamp())
+    return seconds[in_range], prices[in_range]
+
+price_history = PriceHistoryRecorder()
@@ -0,0 +1,208 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+import asyncio
+import os
+import random
+import zlib
+
+from fx_rates import fx_rates
+from crypto_prices import crypto_tickers
+from stock_prices import stock_quotes
+from coin_scraper import coin_scraper
+
+PRICE_SOURCES = ('crypto', 'stock', 'coin')
+
+# 'live' (Binance, Yahoo Finance, page scraping) or 'fake'; PRICE_PROVIDER_<SOURCE> overrides one source
+PRICE_PROVIDER = os.environ.get('PRICE_PROVIDER', 'live')
+
+FAKE_PRICE_LATENCY_MS = float(os.environ.get('FAKE_PRICE_LATENCY_MS', '50'))
+FAKE_PRICE_LATENCY_SIGMA = float(os.environ.get('FAKE_PRICE_LATENCY_SIGMA', '0.5'))
+FAKE_PRICE_ERROR_RATE = float(os.environ.get('FAKE_PRICE_ERROR_RATE', '0'))
+FAKE_PRICE_FAILURE_RATE = float(os.environ.get('FAKE_PRICE_FAILURE_RATE', '0'))
+FAKE_PRICE_VOLATILITY = float(os.environ.get('FAKE_PRICE_VOLATILITY', '0.001'))
+FAKE_PRICE_SEED = os.environ.get('FAKE_PRICE_SEED')
+
+class PriceProvider(ABC):
+    """Source of EUR prices for one asset class.
+
+    get_prices takes price keys of that class (('crypto', symbol),
+    ('stock', symbol) or ('coin', url, css_selector)) and returns a price
+    for each, None when that key could not be priced. Raising means the
+    whole batch failed.
+    """
+
+    name = 'provider'
+
+    @abstractmethod
+    async def get_prices(self, price_keys: list) -> dict:
+        ...
+
+    async def get_price(self, price_key: tuple) -> Optional[float]:
+        return (await self.get_prices([price_key])).get(price_key)
+
+    def upstream_batches(self, price_keys: list) -> list:
+        """Split keys into the batches that each cost one upstream request.
+
+        Callers limit concurrency per batch, so providers that fan a call out
+        into several requests split it here.
+        """
+        return [price_keys]
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+async def _to_eur(amount: Optional[float], currency: Optional[str]) -> Optional[float]:
+    """Convert to EUR; None when the amount or its currency is unknown"""
+    if amount is None or currency is None:
+        return None
+    return await fx_rates.convert(amount, currency)
+
+class BinancePriceProvider(PriceProvider):
+    """Crypto prices from one Binance ticker snapshot, converted from USD"""
+
+    name = 'binance'
+
+    async def get_prices(self, price_keys: list) -> dict:
+        usd_prices = await crypto_tickers.get_usd_prices([key[1] for key in price_keys])
+        return {key: await _to_eur(usd_prices.get(key[1]), 'USD') for key in price_keys}
+
+class YahooPriceProvider(PriceProvider):
+    """Stock last closes from batched Yahoo Finance downloads, converted from the listing currency"""
+
+    name = 'yahoo'
+
+    async def get_prices(self, price_keys: list) -> dict:
+        quotes = await stock_quotes.get_quotes([key[1] for key in price_keys])
+        return {key: await _to_eur(*quotes[key[1]]) for key in price_keys}
+
+class CoinScraperPriceProvider(PriceProvider):
+    """Coin prices scraped from the configured pages, with one download and parse per URL"""
+
+    name = 'scraper'
+
+    def upstream_batches(self, price_keys: list) -> list:
+        by_url = {}
+        for key in price_keys:
+            by_url.setdefault(key[1], []).append(key)
+        return list(by_url.values())
+
+    async def get_prices(self, price_keys: list) -> dict:
+        selectors_by_url = {}
+        for key in price_keys:
+            selectors_by_url.setdefault(key[1], []).append(key[2])
+        urls = list(selectors_by_url)
+        results = await asyncio.gather(
+            *[coin_scraper.get_prices(url, selectors_by_url[url]) for url in urls],
+            return_exceptions=True
+        )
+        prices = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                continue
+            for css_selector, price in result.items():
+                prices[('coin', url, css_selector)] = price
+        return {key: prices.get(key) for key in price_keys}
+
+class FakePriceProvider(PriceProvider):
+    """In-process provider for offline load tests and benchmarks.
+
+    Each call sleeps for a log-normal latency around latency_ms, fails as a
+    whole with probability failure_rate and leaves each key unpriced with
+    probability error_rate. Prices start from a stable value derived from the
+    key and follow a random walk with the given volatility per call.
+    """
+
+    name = 'fake'
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_PRICE_LATENCY_MS,
+        latency_sigma: float = FAKE_PRICE_LATENCY_SIGMA,
+        error_rate: float = FAKE_PRICE_ERROR_RATE,
+        failure_rate: float = FAKE_PRICE_FAILURE_RATE,
+        volatility: float = FAKE_PRICE_VOLATILITY,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.volatility = volatility
+        self.calls = 0
+        self.keys_requested = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._prices: dict = {}
+
+    def latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms * self._rng.lognormvariate(0, self.latency_sigma) / 1000
+
+    def _next_price(self, price_key: tuple) -> float:
+        price = self._prices.get(price_key)
+        if price is None:
+            price = 1 + zlib.crc32(repr(price_key).encode()) % 100000 / 100
+        else:
+            price *= 1 + self._rng.gauss(0, self.volatility)
+        self._prices[price_key] = price
+        return round(price, 6)
+
+    async def get_prices(self, price_keys: list) -> dict:
+        self.calls += 1
+        self.keys_requested += len(price_keys)
+        await asyncio.sleep(self.latency())
+        if self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise RuntimeError("Fake provider batch failure")
+        return {
+            key: None if self._rng.random() < self.error_rate else self._next_price(key)
+            for key in price_keys
+        }
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "keys_requested": self.keys_requested,
+            "failures": self.failures
+        }
+
+LIVE_PROVIDERS = {
+    'crypto': BinancePriceProvider,
+    'stock': YahooPriceProvider,
+    'coin': CoinScraperPriceProvider,
+}
+
+class PriceProviderRegistry:
+    """The provider used for each asset class"""
+
+    def __init__(self):
+        self._providers: dict = {}
+
+    def register(self, source: str, provider: PriceProvider):
+        if source not in PRICE_SOURCES:
+            raise ValueError(f"Unknown price source: {source}")
+        self._providers[source] = provider
+
+    def get(self, source: str) -> PriceProvider:
+        provider = self._providers.get(source)
+        if provider is None:
+            raise ValueError(f"Unknown price source: {source}")
+        return provider
+
+    def stats(self) -> dict:
+        return {source: provider.stats() for source, provider in self._providers.items()}
+
+def provider_from_env(source: str) -> PriceProvider:
+    kind = os.environ.get(f'PRICE_PROVIDER_{source.upper()}', PRICE_PROVIDER)
+    if kind == 'fake':
+        seed = int(FAKE_PRICE_SEED) if FAKE_PRICE_SEED is not None else None
+        return FakePriceProvider(seed=seed)
+    if kind == 'live':
+        return LIVE_PROVIDERS[source]()
+    raise ValueError(f"Unknown price provider '{kind}' for {source}")
+
+price_providers = PriceProviderRegistry()
+for _source in PRICE_SOURCES:
+    price_providers.register(_source, provider_from_env(_source))
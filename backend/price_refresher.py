@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import random
+from sqlalchemy import select
+
+from database import (
+    AsyncSessionLocal,
+    CryptoAsset as DBCryptoAsset,
+    StockAsset as DBStockAsset,
+    CoinAsset as DBCoinAsset
+)
+from prices import refresh_prices
+
+logger = logging.getLogger(__name__)
+
+# Refresh intervals per source; keep them below the PRICE_TTL_* values so reads stay warm
+REFRESH_INTERVALS = {
+    'crypto': float(os.environ.get('PRICE_REFRESH_CRYPTO_SECONDS', '20')),
+    'stock': float(os.environ.get('PRICE_REFRESH_STOCK_SECONDS', '45')),
+    'coin': float(os.environ.get('PRICE_REFRESH_COIN_SECONDS', '240')),
+}
+PRICE_REFRESHER_ENABLED = os.environ.get('PRICE_REFRESHER_ENABLED', 'true').lower() == 'true'
+HOLDINGS_RESCAN_INTERVAL = float(os.environ.get('PRICE_REFRESH_HOLDINGS_SECONDS', '60'))
+REFRESH_JITTER = 0.1
+REFRESH_MAX_BACKOFF = float(os.environ.get('PRICE_REFRESH_MAX_BACKOFF_SECONDS', '900'))
+
+async def load_held_price_keys() -> dict:
+    """Return the distinct price keys held by any user, grouped by source"""
+    async with AsyncSessionLocal() as db:
+        crypto_result = await db.execute(select(DBCryptoAsset.symbol).distinct())
+        stock_result = await db.execute(select(DBStockAsset.symbol).distinct())
+        coin_result = await db.execute(select(DBCoinAsset.url, DBCoinAsset.css_selector).distinct())
+        return {
+            'crypto': {('crypto', symbol.upper()) for symbol in crypto_result.scalars().all()},
+            'stock': {('stock', symbol.upper()) for symbol in stock_result.scalars().all()},
+            'coin': {('coin', url, css_selector) for url, css_selector in coin_result.all()},
+        }
+
+class PriceRefresher:
+    """Background worker keeping every held price warm in the shared price cache"""
+
+    def __init__(self, intervals: dict = REFRESH_INTERVALS):
+        self.intervals = intervals
+        self.held_keys = {source: set() for source in intervals}
+        self.failures = {source: 0 for source in intervals}
+        self._loaded = asyncio.Event()
+        self._tasks = []
+
+    def track(self, price_key: tuple):
+        """Start refreshing a newly held price key without waiting for the next rescan"""
+        self.held_keys.setdefault(price_key[0], set()).add(price_key)
+
+    async def refresh_source(self, source: str):
+        """Refresh all held keys of a source once; returns (refreshed, failed) counts"""
+        keys = list(self.held_keys.get(source, ()))
+        if not keys:
+            return 0, 0
+        prices = await refresh_prices(keys)
+        failed = sum(1 for price in prices.values() if price is None)
+        return len(keys) - failed, failed
+
+    def next_delay(self, source: str) -> float:
+        delay = self.intervals[source]
+        if self.failures[source]:
+            delay = min(delay * 2 ** self.failures[source], REFRESH_MAX_BACKOFF)
+        return delay * random.uniform(1 - REFRESH_JITTER, 1 + REFRESH_JITTER)
+
+    async def _holdings_loop(self):
+        while True:
+            try:
+                self.held_keys = await load_held_price_keys()
+                self._loaded.set()
+            except Exception as e:
+                logger.warning(f"Price refresher could not load holdings: {e}")
+            await asyncio.sleep(HOLDINGS_RESCAN_INTERVAL)
+
+    async def _source_loop(self, source: str):
+        await self._loaded.wait()
+        while True:
+            try:
+                refreshed, failed = await self.refresh_source(source)
+                # Back off only when the whole source is failing, not on a single bad symbol
+                self.failures[source] = self.failures[source] + 1 if failed and not refreshed else 0
+                if failed:
+                    logger.info(f"Refreshed {refreshed} {source} prices, {failed} failed")
+            except Exception as e:
+                self.failures[source] += 1
+                logger.warning(f"Price refresh for {source} failed: {e}")
+            await asyncio.sleep(self.next_delay(source))
+
+    def start(self):
+        if self._tasks:
+            return
+        self._loaded = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._holdings_loop())]
+        self._tasks += [asyncio.ensure_future(self._source_loop(source)) for source in self.intervals]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+price_refresher = PriceRefresher()
@@ -0,0 +1,152 @@
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from cache import TTLCache
+from price_providers import price_providers
+
+logger = logging.getLogger(__name__)
+
+# Process-wide price cache, keyed by (source, symbol) or ('coin', url, css_selector)
+PRICE_TTLS = {
+    'crypto': float(os.environ.get('PRICE_TTL_CRYPTO', '30')),
+    'stock': float(os.environ.get('PRICE_TTL_STOCK', '60')),
+    'coin': float(os.environ.get('PRICE_TTL_COIN', '300')),
+}
+price_cache = TTLCache(maxsize=int(os.environ.get('PRICE_CACHE_SIZE', '4096')))
+
+# Upstream concurrency per source and overall deadline for multi-asset lookups
+PRICE_CONCURRENCY = {
+    'crypto': int(os.environ.get('PRICE_CONCURRENCY_CRYPTO', '8')),
+    'stock': int(os.environ.get('PRICE_CONCURRENCY_STOCK', '4')),
+    'coin': int(os.environ.get('PRICE_CONCURRENCY_COIN', '4')),
+}
+PRICE_DEADLINE = float(os.environ.get('PRICE_DEADLINE_SECONDS', '8'))
+_source_limits = {source: asyncio.Semaphore(limit) for source, limit in PRICE_CONCURRENCY.items()}
+
+async def _limited(source: str, fetch):
+    async with _source_limits[source]:
+        return await fetch()
+
+# Upstream fetches, one provider call per source
+def _group_by_source(price_keys) -> dict:
+    by_source = {}
+    for key in price_keys:
+        by_source.setdefault(key[0], []).append(key)
+    return by_source
+
+async def _fetch_batch(source: str, provider, price_keys: list) -> dict:
+    try:
+        return await _limited(source, lambda: provider.get_prices(price_keys))
+    except Exception:
+        return {}
+
+async def _fetch_source(source: str, price_keys: list) -> dict:
+    # PRICE_CONCURRENCY applies to upstream requests (e.g. one per scraped page), not to whole batches
+    provider = price_providers.get(source)
+    results = await asyncio.gather(*[
+        _fetch_batch(source, provider, batch) for batch in provider.upstream_batches(price_keys)
+    ])
+    prices = {key: price for result in results for key, price in result.items()}
+    return {key: prices.get(key) for key in price_keys}
+
+async def fetch_prices_eur(price_keys) -> dict:
+    """Fetch many prices upstream, bypassing the cache; unpriced keys map to None.
+
+    Price keys are ('crypto', symbol), ('stock', symbol) or ('coin', url, css_selector).
+    """
+    by_source = _group_by_source(price_keys)
+    results = await asyncio.gather(*[_fetch_source(source, keys) for source, keys in by_source.items()])
+    return {key: price for result in results for key, price in result.items()}
+
+async def fetch_price_eur(price_key: tuple) -> Optional[float]:
+    """Fetch a price upstream, bypassing the cache"""
+    return (await _fetch_source(price_key[0], [price_key]))[price_key]
+
+# Price change notifications, published on every cache write (refresher and request paths)
+_price_listeners = []
+
+def add_price_listener(callback):
+    """Register callback(price_key, price) to be called whenever a cached price changes"""
+    _price_listeners.append(callback)
+
+def remove_price_listener(callback):
+    if callback in _price_listeners:
+        _price_listeners.remove(callback)
+
+def _store_prices(prices: dict):
+    """Write fetched prices to the shared cache and notify listeners of those that changed"""
+    for price_key, price in prices.items():
+        if price is None:
+            continue
+        previous = price_cache.get(price_key)
+        price_cache.set(price_key, price, PRICE_TTLS[price_key[0]])
+        if price != previous:
+            for callback in list(_price_listeners):
+                try:
+                    callback(price_key, price)
+                except Exception as e:
+                    logger.warning(f"Price listener failed: {e}")
+
+async def _load_source(source: str, price_keys: list) -> dict:
+    prices = await _fetch_source(source, price_keys)
+    _store_prices(prices)
+    return prices
+
+# Cached lookups used by the route handlers
+async def get_price_eur(price_key: tuple) -> Optional[float]:
+    async def load():
+        return (await _load_source(price_key[0], [price_key]))[price_key]
+    return await price_cache.get_or_load(price_key, load, PRICE_TTLS[price_key[0]])
+
+async def get_crypto_price_eur(symbol: str) -> Optional[float]:
+    return await get_price_eur(('crypto', symbol.upper()))
+
+async def get_stock_price_eur(symbol: str) -> Optional[float]:
+    return await get_price_eur(('stock', symbol.upper()))
+
+async def get_coin_price_eur(url: str, css_selector: str) -> Optional[float]:
+    return await get_price_eur(('coin', url, css_selector))
+
+async def refresh_prices(price_keys) -> dict:
+    """Fetch prices upstream in batches, store them in the shared cache and notify listeners of changes"""
+    prices = await fetch_prices_eur(price_keys)
+    _store_prices(prices)
+    return prices
+
+async def refresh_price(price_key: tuple) -> Optional[float]:
+    return (await refresh_prices([price_key]))[price_key]
+
+async def resolve_prices(price_keys: dict, deadline: float = None):
+    """Resolve many prices concurrently within an overall deadline.
+
+    price_keys maps caller keys (e.g. asset ids) to price keys; identical price
+    keys are looked up once and the cache misses of each source are fetched
+    with a single provider call. Returns (prices, timed_out) where prices maps each
+    resolved caller key to its price (None on upstream failure) and timed_out
+    lists the caller keys still pending at the deadline. Lookups cut off by the
+    deadline keep running in the cache and land there for the next request.
+    """
+    prices_by_key, tasks = {}, {}
+    for source, keys in _group_by_source(set(price_keys.values())).items():
+        loader = lambda keys, source=source: _load_source(source, keys)
+        cached, loading = price_cache.load_many(keys, loader, PRICE_TTLS[source])
+        prices_by_key.update(cached)
+        tasks.update(loading)
+    if tasks:
+        await asyncio.wait(set(tasks.values()), timeout=PRICE_DEADLINE if deadline is None else deadline)
+
+    prices, timed_out = {}, []
+    for caller_key, price_key in price_keys.items():
+        if price_key in prices_by_key:
+            prices[caller_key] = prices_by_key[price_key]
+            continue
+        task = tasks[price_key]
+        if not task.done():
+            timed_out.append(caller_key)
+        elif task.cancelled() or task.exception() is not None:
+            prices[caller_key] = None
+        else:
+            prices[caller_key] = task.result()
+    return prices, timed_out
@@ -0,0 +1,85 @@
+from typing import Awaitable, Callable
+import hashlib
+import json
+import os
+import time
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from cache import TTLCache
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '2000'))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '300'))
+
+class UserVersions:
+    """Per-user change counters for each cacheable resource ('holdings', 'history').
+
+    Handlers that change a resource bump its counter; ETags are derived from
+    the counter, a hash of the user and a per-process token so they stay
+    unique across users and restarts.
+    """
+
+    def __init__(self):
+        self._versions: dict = {}  # (user_id, resource) -> int
+        self._boot = f"{time.time_ns():x}"
+
+    def get(self, user_id: str, resource: str) -> int:
+        return self._versions.get((user_id, resource), 0)
+
+    def bump(self, user_id: str, resource: str):
+        key = (user_id, resource)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def etag(self, user_id: str, resource: str) -> str:
+        # The user is part of the tag so that users at the same version never share one (e.g. in a shared browser)
+        user = hashlib.sha256(f"{self._boot}:{user_id}".encode()).hexdigest()[:16]
+        return f'"{resource}-{self._boot}-{user}-{self.get(user_id, resource)}"'
+
+user_versions = UserVersions()
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check using weak comparison (RFC 9110), as proxies often weaken ETags"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque_tag(etag) in [_opaque_tag(tag) for tag in if_none_match.split(",")]
+
+async def versioned_response(
+    request: Request,
+    user_id: str,
+    resource: str,
+    build: Callable[[], Awaitable[tuple]]
+) -> Response:
+    """JSON response with an ETag from the user's resource version.
+
+    Answers 304 on a matching If-None-Match without calling build. Otherwise
+    build() returns (payload, extra headers); the serialized body is cached
+    per URL and version when RESPONSE_CACHE_ENABLED, so unchanged data is
+    neither queried nor serialized again.
+    """
+    etag = user_versions.etag(user_id, resource)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    key = (user_id, request.url.path, request.url.query, etag)
+    cached = response_cache.get(key) if RESPONSE_CACHE_ENABLED else None
+    if cached is None:
+        payload, extra_headers = await build()
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        cached = (body, extra_headers)
+        if RESPONSE_CACHE_ENABLED:
+            response_cache.set(key, cached)
+    body, extra_headers = cached
+    return Response(content=body, media_type="application/json", headers={**headers, **extra_headers})
+
+def response_cache_stats() -> dict:
+    return {"enabled": RESPONSE_CACHE_ENABLED, "size": len(response_cache), "maxsize": response_cache.maxsize}
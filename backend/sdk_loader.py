@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+from typing import Callable, Optional
+import importlib
+import logging
+import os
+import threading
+import time
+
+from http_client import run_blocking
+
+logger = logging.getLogger(__name__)
+
+SDK_WARMUP_ENABLED = os.environ.get('SDK_WARMUP_ENABLED', 'true').lower() == 'true'
+SDK_RETRY_SECONDS = float(os.environ.get('SDK_RETRY_SECONDS', '60'))
+
+class LazySDK:
+    """A third-party SDK imported and initialised on first use.
+
+    init receives the imported module and returns the object handed to
+    callers (the module itself when init is None). A failed init returns None
+    and is retried after SDK_RETRY_SECONDS. get() blocks while importing,
+    so call it from the blocking pool or a warm-up task, not the event loop.
+    """
+
+    def __init__(self, name: str, module: str, init: Optional[Callable] = None):
+        self.name = name
+        self.module = module
+        self.init = init
+        self.import_seconds: Optional[float] = None
+        self.init_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._value = None
+        self._loaded = False
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if self._loaded:
+                return self._value
+            if self.error is not None and time.monotonic() - self._failed_at < SDK_RETRY_SECONDS:
+                return None
+            start = time.perf_counter()
+            try:
+                module = importlib.import_module(self.module)
+            except ImportError as e:
+                self._fail(f"import failed: {e}")
+                return None
+            finally:
+                if self.import_seconds is None:
+                    self.import_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            try:
+                value = self.init(module) if self.init is not None else module
+            except Exception as e:
+                self._fail(f"init failed: {e}")
+                return None
+            finally:
+                self.init_seconds = time.perf_counter() - start
+            self._value = value
+            self._loaded = True
+            self.error = None
+            return value
+
+    def _fail(self, error: str):
+        self.error = error
+        self._failed_at = time.monotonic()
+        logger.warning(f"SDK {self.name} unavailable: {error}")
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "import_ms": round(self.import_seconds * 1000, 1) if self.import_seconds is not None else None,
+            "init_ms": round(self.init_seconds * 1000, 1) if self.init_seconds is not None else None,
+            "error": self.error
+        }
+
+class SDKLoader:
+    """Lazily loaded third-party SDKs plus timings of the app's own startup steps"""
+
+    def __init__(self):
+        self._sdks: dict = {}
+        self._startup: dict = {}  # step name -> seconds
+
+    def register(self, name: str, module: str, init: Optional[Callable] = None) -> LazySDK:
+        sdk = self._sdks.get(name)
+        if sdk is None:
+            sdk = self._sdks[name] = LazySDK(name, module, init)
+        return sdk
+
+    def get(self, name: str):
+        return self._sdks[name].get()
+
+    def record(self, step: str, seconds: float):
+        self._startup[step] = seconds
+
+    @contextmanager
+    def timed(self, step: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(step, time.perf_counter() - start)
+
+    def warm_up(self):
+        """Load every registered SDK now (blocking); returns the report"""
+        for sdk in list(self._sdks.values()):
+            sdk.get()
+        return self.report()
+
+    async def warm_up_in_background(self):
+        """Load the SDKs in the blocking pool after startup, then log the timings"""
+        await run_blocking(self.warm_up)
+        self.log_report()
+
+    def report(self) -> dict:
+        return {
+            "startup_ms": {step: round(seconds * 1000, 1) for step, seconds in self._startup.items()},
+            "sdks": {name: sdk.stats() for name, sdk in self._sdks.items()}
+        }
+
+    def log_report(self):
+        for step, seconds in self._startup.items():
+            logger.info(f"Startup {step}: {seconds * 1000:.0f} ms")
+        for name, sdk in self._sdks.items():
+            stats = sdk.stats()
+            if stats["loaded"]:
+                logger.info(f"SDK {name}: import {stats['import_ms']} ms, init {stats['init_ms']} ms")
+            elif stats["error"]:
+                logger.warning(f"SDK {name}: {stats['error']}")
+
+sdks = SDKLoader()
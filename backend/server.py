@@ -1,28 +1,30 @@
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import time
+
+IMPORT_STARTED = time.perf_counter()
 
 # Load environment variables before importing other modules
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends
-from fastapi.responses import HTMLResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, Query
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, and_, or_
 import logging
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from typing import List, Optional, Union
 import uuid
-from datetime import datetime
-import yfinance as yf
-import requests
-from bs4 import BeautifulSoup
-from binance.client import Client
+from datetime import datetime, timezone, timedelta
+import base64
+import numpy as np
 import urllib.parse
 import secrets
+import asyncio
+import json
 
 from database import (
     get_db, init_db,
@@ -30,14 +32,33 @@ from database import (
     StockAsset as DBStockAsset,
     CoinAsset as DBCoinAsset,
     HistorySnapshot as DBHistorySnapshot,
+    ClosedPosition as DBClosedPosition,
     User as DBUser,
     UserSession as DBUserSession
 )
+from http_client import close_http_client
+from prices import (
+    get_crypto_price_eur, get_stock_price_eur, get_coin_price_eur, resolve_prices,
+    price_cache, add_price_listener, remove_price_listener
+)
+from price_refresher import price_refresher, PRICE_REFRESHER_ENABLED
+from session_reaper import session_reaper, SESSION_REAPER_ENABLED
+from snapshot_job import snapshot_job, AUTO_SNAPSHOT_ENABLED
+from price_history import price_history, load_price_history, PRICE_HISTORY_ENABLED
+from valuation import valuation_engine, ASSET_CLASSES
+from holdings import load_holdings_rows, split_by_class
 from auth_pg import exchange_session_id, logout_user as logout_user_pg
 from auth_email import (
-    create_user, authenticate_user, get_current_user, logout_user,
-    UserSignup, UserLogin, User
+    create_user_with_session, authenticate_user, get_current_user, logout_user,
+    UserSignup, UserLogin, User, session_cache, password_pool_stats
 )
+from coin_scraper import coin_scraper
+from downsampling import BUCKET_SECONDS, bucket_ohlc, lttb
+from analytics import unrealised_pnl, allocation, performance
+from static_assets import frontend_assets
+from response_cache import user_versions, versioned_response, response_cache_stats, etag_matches
+from sdk_loader import sdks, SDK_WARMUP_ENABLED
+from price_providers import price_providers
 
 # Try multiple possible locations for frontend build
 possible_paths = [
@@ -55,18 +76,6 @@ for path in possible_paths:
         FRONTEND_BUILD = path
         break
 
-binance_api_key = os.environ.get('BINANCE_API_KEY', 'BtXraKHkudYowil8u1ez4SYjg8BZFiWBflZKmc7P7zqngPJ4uqQXpV2nujCAX0ia')
-binance_client = None
-
-def get_binance_client():
-    global binance_client
-    if binance_client is None:
-        try:
-            binance_client = Client(binance_api_key, '', testnet=False)
-        except Exception as e:
-            binance_client = False
-    return binance_client if binance_client is not False else None
-
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
@@ -119,6 +128,11 @@ class CoinAssetResponse(BaseModel):
     quantity: float
     created_at: datetime
 
+class HoldingsResponse(BaseModel):
+    crypto: List[CryptoAssetResponse]
+    stocks: List[StockAssetResponse]
+    coins: List[CoinAssetResponse]
+
 class HistorySnapshotResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: str
@@ -128,59 +142,19 @@ class HistorySnapshotResponse(BaseModel):
     stocks_value_eur: float
     coins_value_eur: float
 
-# Helper functions
-def get_eur_usd_rate():
-    try:
-        response = requests.get('https://api.exchangerate-api.com/v4/latest/USD', timeout=5)
-        return response.json()['rates']['EUR']
-    except:
-        return 0.92
-
-async def get_crypto_price_eur(symbol: str) -> Optional[float]:
-    try:
-        client = get_binance_client()
-        if client is None:
-            return None
-        ticker = client.get_symbol_ticker(symbol=f"{symbol.upper()}USDT")
-        usd_price = float(ticker['price'])
-        return usd_price * get_eur_usd_rate()
-    except:
-        return None
-
-async def get_stock_price_eur(symbol: str) -> Optional[float]:
-    try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period='1d')
-        if not hist.empty:
-            return hist['Close'].iloc[-1] * get_eur_usd_rate()
-        return None
-    except:
-        return None
-
-async def get_coin_price_eur(url: str, css_selector: str) -> Optional[float]:
-    try:
-        response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-        soup = BeautifulSoup(response.content, 'html.parser')
-        element = soup.select_one(css_selector)
-        if element:
-            import re
-            price_text = element.get_text().strip().replace('€', '').replace(',', '.').replace(' ', '')
-            match = re.search(r'(\d+\.?\d*)', price_text)
-            if match:
-                return float(match.group(1))
-        return None
-    except:
-        return None
+class BucketedSnapshotResponse(HistorySnapshotResponse):
+    # Total value OHLC within the bucket; total_value_eur is the close
+    total_open_eur: float
+    total_high_eur: float
+    total_low_eur: float
 
 # Auth routes
 @api_router.post("/auth/signup")
 async def signup(signup_data: UserSignup, response: Response, db: AsyncSession = Depends(get_db)):
     """Create a new user account"""
     try:
-        user = await create_user(signup_data, db)
-        # Automatically log in the new user
-        login_data = UserLogin(email=signup_data.email, password=signup_data.password)
-        result = await authenticate_user(login_data, db)
+        # Create the user and log them in with a single transaction
+        result = await create_user_with_session(signup_data, db)
         
         response.set_cookie(
             key="session_token", 
@@ -385,6 +359,36 @@ async def create_session(req: SessionIdRequest, response: Response, db: AsyncSes
     response.set_cookie(key="session_token", value=result['session_token'], httponly=True, secure=True, samesite="none", max_age=7*24*60*60, path="/")
     return result
 
+# Price history helpers
+PRICE_HISTORY_DEFAULT_DAYS = 7
+PRICE_HISTORY_MAX_POINTS = 5000
+
+async def price_history_response(price_key: tuple, from_: Optional[datetime], to: Optional[datetime], points: Optional[int], db: AsyncSession) -> dict:
+    """Recorded EUR prices of a price key as parallel timestamp/price lists, oldest first"""
+    end = as_utc(to) if to is not None else datetime.now(timezone.utc)
+    start = as_utc(from_) if from_ is not None else end - timedelta(days=PRICE_HISTORY_DEFAULT_DAYS)
+    seconds, prices = await load_price_history(db, price_key, start, end)
+    if points is not None and len(seconds) > points:
+        keep = lttb(seconds, prices, points)
+        seconds, prices = seconds[keep], prices[keep]
+    return {
+        "timestamps": [datetime.fromtimestamp(int(ts), tz=timezone.utc).isoformat() for ts in seconds],
+        "prices_eur": prices.tolist()
+    }
+
+async def record_closed_position(db: AsyncSession, user_id: str, asset_class: str, asset, price_key: tuple):
+    """Keep a deleted crypto/stock holding as a purchase inflow and a sale outflow for the returns"""
+    prices, _ = await resolve_prices({price_key: price_key})
+    price = prices.get(price_key)
+    db.add(DBClosedPosition(
+        user_id=user_id,
+        asset_class=asset_class,
+        asset_id=asset.asset_id,
+        opened_at=asset.created_at,
+        cost_eur=asset.quantity * asset.purchase_price,
+        proceeds_eur=asset.quantity * price if price is not None else None
+    ))
+
 # Crypto endpoints
 @api_router.post("/crypto", response_model=CryptoAssetResponse)
 async def create_crypto(asset: CryptoAssetCreate, request: Request, db: AsyncSession = Depends(get_db)):
@@ -393,13 +397,20 @@ async def create_crypto(asset: CryptoAssetCreate, request: Request, db: AsyncSes
     db.add(crypto)
     await db.commit()
     await db.refresh(crypto)
+    price_refresher.track(('crypto', crypto.symbol.upper()))
+    valuation_engine.add_holding(current_user.user_id, 'crypto', f"crypto-{crypto.asset_id}", ('crypto', crypto.symbol.upper()), crypto.quantity)
+    user_versions.bump(current_user.user_id, "holdings")
     return CryptoAssetResponse(id=crypto.asset_id, **asset.model_dump(), created_at=crypto.created_at)
 
 @api_router.get("/crypto", response_model=List[CryptoAssetResponse])
 async def get_cryptos(request: Request, db: AsyncSession = Depends(get_db)):
     current_user = await get_current_user(request, db)
-    result = await db.execute(select(DBCryptoAsset).where(DBCryptoAsset.user_id == current_user.user_id))
-    return [CryptoAssetResponse(id=c.asset_id, name=c.name, symbol=c.symbol, quantity=c.quantity, purchase_price=c.purchase_price, created_at=c.created_at) for c in result.scalars().all()]
+    
+    async def build():
+        result = await db.execute(select(DBCryptoAsset).where(DBCryptoAsset.user_id == current_user.user_id))
+        return [CryptoAssetResponse(id=c.asset_id, name=c.name, symbol=c.symbol, quantity=c.quantity, purchase_price=c.purchase_price, created_at=c.created_at) for c in result.scalars().all()], {}
+    
+    return await versioned_response(request, current_user.user_id, "holdings", build)
 
 @api_router.delete("/crypto/{crypto_id}")
 async def delete_crypto(crypto_id: str, request: Request, db: AsyncSession = Depends(get_db)):
@@ -408,8 +419,11 @@ async def delete_crypto(crypto_id: str, request: Request, db: AsyncSession = Dep
     crypto = result.scalar_one_or_none()
     if not crypto:
         raise HTTPException(status_code=404, detail="Crypto not found")
+    await record_closed_position(db, current_user.user_id, 'crypto', crypto, ('crypto', crypto.symbol.upper()))
     await db.delete(crypto)
     await db.commit()
+    valuation_engine.remove_holding(current_user.user_id, 'crypto', f"crypto-{crypto.asset_id}", ('crypto', crypto.symbol.upper()), crypto.quantity)
+    user_versions.bump(current_user.user_id, "holdings")
     return {"message": "Deleted successfully"}
 
 @api_router.get("/crypto/{crypto_id}/price")
@@ -424,6 +438,22 @@ async def get_crypto_current_price(crypto_id: str, request: Request, db: AsyncSe
         raise HTTPException(status_code=500, detail="Unable to fetch price")
     return {"symbol": crypto.symbol, "current_price_eur": price_eur, "total_value_eur": price_eur * crypto.quantity}
 
+@api_router.get("/crypto/{crypto_id}/price-history")
+async def get_crypto_price_history(
+    crypto_id: str,
+    request: Request,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    points: Optional[int] = Query(None, ge=3, le=PRICE_HISTORY_MAX_POINTS),
+    db: AsyncSession = Depends(get_db)
+):
+    current_user = await get_current_user(request, db)
+    result = await db.execute(select(DBCryptoAsset).where(DBCryptoAsset.asset_id == crypto_id, DBCryptoAsset.user_id == current_user.user_id))
+    crypto = result.scalar_one_or_none()
+    if not crypto:
+        raise HTTPException(status_code=404, detail="Crypto not found")
+    return await price_history_response(('crypto', crypto.symbol.upper()), from_, to, points, db)
+
 # Stock endpoints
 @api_router.post("/stocks", response_model=StockAssetResponse)
 async def create_stock(asset: StockAssetCreate, request: Request, db: AsyncSession = Depends(get_db)):
@@ -432,13 +462,20 @@ async def create_stock(asset: StockAssetCreate, request: Request, db: AsyncSessi
     db.add(stock)
     await db.commit()
     await db.refresh(stock)
+    price_refresher.track(('stock', stock.symbol.upper()))
+    valuation_engine.add_holding(current_user.user_id, 'stocks', f"stock-{stock.asset_id}", ('stock', stock.symbol.upper()), stock.quantity)
+    user_versions.bump(current_user.user_id, "holdings")
     return StockAssetResponse(id=stock.asset_id, **asset.model_dump(), created_at=stock.created_at)
 
 @api_router.get("/stocks", response_model=List[StockAssetResponse])
 async def get_stocks(request: Request, db: AsyncSession = Depends(get_db)):
     current_user = await get_current_user(request, db)
-    result = await db.execute(select(DBStockAsset).where(DBStockAsset.user_id == current_user.user_id))
-    return [StockAssetResponse(id=s.asset_id, name=s.name, symbol=s.symbol, quantity=s.quantity, purchase_price=s.purchase_price, created_at=s.created_at) for s in result.scalars().all()]
+    
+    async def build():
+        result = await db.execute(select(DBStockAsset).where(DBStockAsset.user_id == current_user.user_id))
+        return [StockAssetResponse(id=s.asset_id, name=s.name, symbol=s.symbol, quantity=s.quantity, purchase_price=s.purchase_price, created_at=s.created_at) for s in result.scalars().all()], {}
+    
+    return await versioned_response(request, current_user.user_id, "holdings", build)
 
 @api_router.delete("/stocks/{stock_id}")
 async def delete_stock(stock_id: str, request: Request, db: AsyncSession = Depends(get_db)):
@@ -447,8 +484,11 @@ async def delete_stock(stock_id: str, request: Request, db: AsyncSession = Depen
     stock = result.scalar_one_or_none()
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
+    await record_closed_position(db, current_user.user_id, 'stocks', stock, ('stock', stock.symbol.upper()))
     await db.delete(stock)
     await db.commit()
+    valuation_engine.remove_holding(current_user.user_id, 'stocks', f"stock-{stock.asset_id}", ('stock', stock.symbol.upper()), stock.quantity)
+    user_versions.bump(current_user.user_id, "holdings")
     return {"message": "Deleted successfully"}
 
 @api_router.get("/stocks/{stock_id}/price")
@@ -463,6 +503,22 @@ async def get_stock_current_price(stock_id: str, request: Request, db: AsyncSess
         raise HTTPException(status_code=500, detail="Unable to fetch price")
     return {"symbol": stock.symbol, "current_price_eur": price_eur, "total_value_eur": price_eur * stock.quantity}
 
+@api_router.get("/stocks/{stock_id}/price-history")
+async def get_stock_price_history(
+    stock_id: str,
+    request: Request,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    points: Optional[int] = Query(None, ge=3, le=PRICE_HISTORY_MAX_POINTS),
+    db: AsyncSession = Depends(get_db)
+):
+    current_user = await get_current_user(request, db)
+    result = await db.execute(select(DBStockAsset).where(DBStockAsset.asset_id == stock_id, DBStockAsset.user_id == current_user.user_id))
+    stock = result.scalar_one_or_none()
+    if not stock:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    return await price_history_response(('stock', stock.symbol.upper()), from_, to, points, db)
+
 # Coin endpoints
 @api_router.post("/coins", response_model=CoinAssetResponse)
 async def create_coin(asset: CoinAssetCreate, request: Request, db: AsyncSession = Depends(get_db)):
@@ -471,13 +527,20 @@ async def create_coin(asset: CoinAssetCreate, request: Request, db: AsyncSession
     db.add(coin)
     await db.commit()
     await db.refresh(coin)
+    price_refresher.track(('coin', coin.url, coin.css_selector))
+    valuation_engine.add_holding(current_user.user_id, 'coins', f"coin-{coin.asset_id}", ('coin', coin.url, coin.css_selector), coin.quantity)
+    user_versions.bump(current_user.user_id, "holdings")
     return CoinAssetResponse(id=coin.asset_id, **asset.model_dump(), created_at=coin.created_at)
 
 @api_router.get("/coins", response_model=List[CoinAssetResponse])
 async def get_coins(request: Request, db: AsyncSession = Depends(get_db)):
     current_user = await get_current_user(request, db)
-    result = await db.execute(select(DBCoinAsset).where(DBCoinAsset.user_id == current_user.user_id))
-    return [CoinAssetResponse(id=c.asset_id, name=c.name, url=c.url, css_selector=c.css_selector, quantity=c.quantity, created_at=c.created_at) for c in result.scalars().all()]
+    
+    async def build():
+        result = await db.execute(select(DBCoinAsset).where(DBCoinAsset.user_id == current_user.user_id))
+        return [CoinAssetResponse(id=c.asset_id, name=c.name, url=c.url, css_selector=c.css_selector, quantity=c.quantity, created_at=c.created_at) for c in result.scalars().all()], {}
+    
+    return await versioned_response(request, current_user.user_id, "holdings", build)
 
 @api_router.delete("/coins/{coin_id}")
 async def delete_coin(coin_id: str, request: Request, db: AsyncSession = Depends(get_db)):
@@ -488,6 +551,8 @@ async def delete_coin(coin_id: str, request: Request, db: AsyncSession = Depends
         raise HTTPException(status_code=404, detail="Coin not found")
     await db.delete(coin)
     await db.commit()
+    valuation_engine.remove_holding(current_user.user_id, 'coins', f"coin-{coin.asset_id}", ('coin', coin.url, coin.css_selector), coin.quantity)
+    user_versions.bump(current_user.user_id, "holdings")
     return {"message": "Deleted successfully"}
 
 @api_router.get("/coins/{coin_id}/price")
@@ -502,32 +567,274 @@ async def get_coin_current_price(coin_id: str, request: Request, db: AsyncSessio
         raise HTTPException(status_code=500, detail="Unable to fetch price")
     return {"name": coin.name, "current_price_eur": price_eur, "total_value_eur": price_eur * coin.quantity}
 
+@api_router.get("/coins/{coin_id}/price-history")
+async def get_coin_price_history(
+    coin_id: str,
+    request: Request,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    points: Optional[int] = Query(None, ge=3, le=PRICE_HISTORY_MAX_POINTS),
+    db: AsyncSession = Depends(get_db)
+):
+    current_user = await get_current_user(request, db)
+    result = await db.execute(select(DBCoinAsset).where(DBCoinAsset.asset_id == coin_id, DBCoinAsset.user_id == current_user.user_id))
+    coin = result.scalar_one_or_none()
+    if not coin:
+        raise HTTPException(status_code=404, detail="Coin not found")
+    return await price_history_response(('coin', coin.url, coin.css_selector), from_, to, points, db)
+
+# Holdings helpers
+async def load_holdings(user_id: str, db: AsyncSession):
+    """Load all crypto, stock and coin holdings of a user in one query"""
+    return split_by_class(await load_holdings_rows(db, user_id))
+
+def holding_price_keys(cryptos, stocks, coins) -> dict:
+    """Map holding keys (crypto-<id>, stock-<id>, coin-<id>) to price keys"""
+    price_keys = {}
+    for c in cryptos:
+        price_keys[f"crypto-{c.asset_id}"] = ('crypto', c.symbol.upper())
+    for s in stocks:
+        price_keys[f"stock-{s.asset_id}"] = ('stock', s.symbol.upper())
+    for c in coins:
+        price_keys[f"coin-{c.asset_id}"] = ('coin', c.url, c.css_selector)
+    return price_keys
+
+def portfolio_totals(prices: dict, cryptos, stocks, coins) -> dict:
+    """Compute per-class and total values from prices keyed by holding key"""
+    def value_of(prefix, assets):
+        return sum((prices.get(f"{prefix}-{a.asset_id}") or 0) * a.quantity for a in assets)
+    
+    crypto_value = value_of("crypto", cryptos)
+    stocks_value = value_of("stock", stocks)
+    coins_value = value_of("coin", coins)
+    return {
+        "total_value_eur": round(crypto_value + stocks_value + coins_value, 2),
+        "crypto_value_eur": round(crypto_value, 2),
+        "stocks_value_eur": round(stocks_value, 2),
+        "coins_value_eur": round(coins_value, 2)
+    }
+
+# Holdings endpoint
+@api_router.get("/holdings", response_model=HoldingsResponse)
+async def get_holdings(request: Request, db: AsyncSession = Depends(get_db)):
+    """All holdings of the user grouped by asset class, loaded in a single query"""
+    current_user = await get_current_user(request, db)
+    
+    async def build():
+        cryptos, stocks, coins = await load_holdings(current_user.user_id, db)
+        return HoldingsResponse(
+            crypto=[CryptoAssetResponse(id=c.asset_id, name=c.name, symbol=c.symbol, quantity=c.quantity, purchase_price=c.purchase_price, created_at=c.created_at) for c in cryptos],
+            stocks=[StockAssetResponse(id=s.asset_id, name=s.name, symbol=s.symbol, quantity=s.quantity, purchase_price=s.purchase_price, created_at=s.created_at) for s in stocks],
+            coins=[CoinAssetResponse(id=c.asset_id, name=c.name, url=c.url, css_selector=c.css_selector, quantity=c.quantity, created_at=c.created_at) for c in coins]
+        ), {}
+    
+    return await versioned_response(request, current_user.user_id, "holdings", build)
+
 # Portfolio overview
 @api_router.get("/portfolio/overview")
 async def get_portfolio_overview(request: Request, db: AsyncSession = Depends(get_db)):
     current_user = await get_current_user(request, db)
+    # Without the refresher no ticks reach the engine, so re-read prices from the cache
+    return await valuation_engine.get_overview(current_user.user_id, db, reprice=not PRICE_REFRESHER_ENABLED)
+
+@api_router.get("/portfolio/prices")
+async def get_portfolio_prices(request: Request, db: AsyncSession = Depends(get_db)):
+    """Current prices of all holdings in one call, keyed as crypto-<id>, stock-<id>, coin-<id>"""
+    current_user = await get_current_user(request, db)
+    cryptos, stocks, coins = await load_holdings(current_user.user_id, db)
+    
+    prices, timed_out = await resolve_prices(holding_price_keys(cryptos, stocks, coins))
+    
+    payloads = {}
+    for c in cryptos:
+        payloads[f"crypto-{c.asset_id}"] = ({"symbol": c.symbol}, c.quantity)
+    for s in stocks:
+        payloads[f"stock-{s.asset_id}"] = ({"symbol": s.symbol}, s.quantity)
+    for c in coins:
+        payloads[f"coin-{c.asset_id}"] = ({"name": c.name}, c.quantity)
+    
+    result, errors = {}, {}
+    for key in timed_out:
+        errors[key] = "Price lookup timed out"
+    for key, price_eur in prices.items():
+        fields, quantity = payloads[key]
+        if price_eur is None:
+            errors[key] = "Unable to fetch price"
+        else:
+            result[key] = {**fields, "current_price_eur": price_eur, "total_value_eur": price_eur * quantity}
+    
+    return {"prices": result, "errors": errors}
+
+STREAM_INTERVAL = float(os.environ.get('PORTFOLIO_STREAM_INTERVAL_SECONDS', '2'))
+STREAM_KEEPALIVE = 15
+
+@api_router.get("/portfolio/stream")
+async def stream_portfolio(request: Request, db: AsyncSession = Depends(get_db)):
+    """Server-Sent Events stream of price and total deltas for the user's holdings.
+    
+    The first event carries the full state; later events only carry what
+    changed, at most one per PORTFOLIO_STREAM_INTERVAL_SECONDS.
+    """
+    current_user = await get_current_user(request, db)
+    cryptos, stocks, coins = await load_holdings(current_user.user_id, db)
+    price_keys = holding_price_keys(cryptos, stocks, coins)
+    quantities = {f"crypto-{c.asset_id}": c.quantity for c in cryptos}
+    quantities.update({f"stock-{s.asset_id}": s.quantity for s in stocks})
+    quantities.update({f"coin-{c.asset_id}": c.quantity for c in coins})
+    
+    watched = set(price_keys.values())
+    changed = asyncio.Event()
+    
+    def on_price_change(price_key, price):
+        if price_key in watched:
+            changed.set()
+    
+    async def events():
+        add_price_listener(on_price_change)
+        try:
+            prices, _ = await resolve_prices(price_keys)
+            sent_prices, sent_totals = {}, {}
+            loop = asyncio.get_running_loop()
+            last_sent = 0.0
+            while True:
+                delta = {}
+                price_delta = {
+                    key: {"current_price_eur": price, "total_value_eur": price * quantities[key]}
+                    for key, price in prices.items()
+                    if price is not None and sent_prices.get(key) != price
+                }
+                if price_delta:
+                    delta["prices"] = price_delta
+                totals = portfolio_totals(prices, cryptos, stocks, coins)
+                if totals != sent_totals:
+                    delta["totals"] = totals
+                if delta:
+                    yield f"event: portfolio\ndata: {json.dumps(delta)}\n\n"
+                    sent_prices.update({key: value["current_price_eur"] for key, value in price_delta.items()})
+                    sent_totals = totals
+                    last_sent = loop.time()
+                
+                try:
+                    await asyncio.wait_for(changed.wait(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                # Coalesce bursts of ticks into at most one message per interval
+                await asyncio.sleep(max(0.0, last_sent + STREAM_INTERVAL - loop.time()))
+                changed.clear()
+                if await request.is_disconnected():
+                    break
+                prices = {key: price_cache.get(price_key, prices.get(key)) for key, price_key in price_keys.items()}
+        finally:
+            remove_price_listener(on_price_change)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/portfolio/analytics")
+async def get_portfolio_analytics(
+    request: Request,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Unrealised P&L per holding, allocation per class and returns over the snapshot history.
+    
+    Crypto and stock purchases (quantity x purchase price at created_at) are
+    the external flows for the time- and money-weighted returns, and deleted
+    ones count as a sale at the price of the day they were removed. Coins have
+    no purchase price and only count towards value and allocation.
+    
+    flows_complete is false when returns may be skewed by flows the server
+    cannot know: coin holdings, or a deletion made while its price was
+    unavailable. Holdings deleted before closed positions were recorded are
+    missing without notice.
+    """
+    current_user = await get_current_user(request, db)
+    cryptos, stocks, coins = await load_holdings(current_user.user_id, db)
+    prices, timed_out = await resolve_prices(holding_price_keys(cryptos, stocks, coins))
+    
+    holdings = [("crypto", f"crypto-{c.asset_id}", c) for c in cryptos]
+    holdings += [("stocks", f"stock-{s.asset_id}", s) for s in stocks]
+    holdings += [("coins", f"coin-{c.asset_id}", c) for c in coins]
+    quantity = np.array([h[2].quantity for h in holdings], dtype=np.float64)
+    purchase_price = np.array([getattr(h[2], "purchase_price", np.nan) for h in holdings], dtype=np.float64)
+    price = np.array([prices.get(h[1]) if prices.get(h[1]) is not None else np.nan for h in holdings], dtype=np.float64)
+    class_index = np.array([ASSET_CLASSES.index(h[0]) for h in holdings], dtype=np.int64)
     
-    crypto_result = await db.execute(select(DBCryptoAsset).where(DBCryptoAsset.user_id == current_user.user_id))
-    cryptos = crypto_result.scalars().all()
+    pnl = unrealised_pnl(quantity, purchase_price, price)
+    priced = ~np.isnan(price)
+    with_cost = priced & ~np.isnan(purchase_price)
+    class_values = np.bincount(class_index[priced], weights=pnl["market_value"][priced], minlength=len(ASSET_CLASSES))
+    cost_total = pnl["cost_basis"][with_cost].sum()
+    pnl_total = pnl["pnl"][with_cost].sum()
     
-    stock_result = await db.execute(select(DBStockAsset).where(DBStockAsset.user_id == current_user.user_id))
-    stocks = stock_result.scalars().all()
+    def number(value):
+        return None if np.isnan(value) else round(float(value), 2)
     
-    coin_result = await db.execute(select(DBCoinAsset).where(DBCoinAsset.user_id == current_user.user_id))
-    coins = coin_result.scalars().all()
+    positions = [
+        {
+            "id": key,
+            "asset_class": asset_class,
+            "name": asset.name,
+            "quantity": asset.quantity,
+            "purchase_price": getattr(asset, "purchase_price", None),
+            "current_price_eur": number(price[i]),
+            "cost_basis_eur": number(pnl["cost_basis"][i]),
+            "market_value_eur": number(pnl["market_value"][i]),
+            "pnl_eur": number(pnl["pnl"][i]),
+            "pnl_pct": number(pnl["pnl_pct"][i])
+        }
+        for i, (asset_class, key, asset) in enumerate(holdings)
+    ]
     
-    crypto_value = sum([(await get_crypto_price_eur(c.symbol) or 0) * c.quantity for c in cryptos])
-    stocks_value = sum([(await get_stock_price_eur(s.symbol) or 0) * s.quantity for s in stocks])
-    coins_value = sum([(await get_coin_price_eur(c.url, c.css_selector) or 0) * c.quantity for c in coins])
+    conditions = [DBHistorySnapshot.user_id == current_user.user_id]
+    if from_ is not None:
+        conditions.append(DBHistorySnapshot.timestamp >= from_)
+    if to is not None:
+        conditions.append(DBHistorySnapshot.timestamp < to)
+    result = await db.execute(
+        select(DBHistorySnapshot.timestamp, DBHistorySnapshot.total_value_eur)
+        .where(*conditions)
+        .order_by(DBHistorySnapshot.timestamp.asc(), DBHistorySnapshot.id.asc())
+    )
+    rows = result.all()
+    timestamps = np.array([as_utc(r.timestamp).timestamp() for r in rows], dtype=np.float64)
+    values = np.array([r.total_value_eur for r in rows], dtype=np.float64)
+    flows = [(a.created_at, a.quantity * a.purchase_price) for a in (*cryptos, *stocks)]
+    result = await db.execute(select(DBClosedPosition).where(DBClosedPosition.user_id == current_user.user_id))
+    closed = result.scalars().all()
+    for position in closed:
+        flows.append((position.opened_at, position.cost_eur))
+        if position.proceeds_eur is not None:
+            flows.append((position.closed_at, -position.proceeds_eur))
+    flows = [(at, amount) for at, amount in flows if at is not None]
+    flow_times = np.array([as_utc(at).timestamp() for at, _ in flows], dtype=np.float64)
+    flow_amounts = np.array([amount for _, amount in flows], dtype=np.float64)
+    flows_complete = not coins and all(p.proceeds_eur is not None for p in closed)
     
     return {
-        "total_value_eur": round(crypto_value + stocks_value + coins_value, 2),
-        "crypto_value_eur": round(crypto_value, 2),
-        "stocks_value_eur": round(stocks_value, 2),
-        "coins_value_eur": round(coins_value, 2),
-        "crypto_count": len(cryptos),
-        "stocks_count": len(stocks),
-        "coins_count": len(coins)
+        "positions": positions,
+        "totals": {
+            "cost_basis_eur": round(float(cost_total), 2),
+            "market_value_eur": round(float(class_values.sum()), 2),
+            "pnl_eur": round(float(pnl_total), 2),
+            "pnl_pct": round(float(pnl_total / cost_total * 100), 2) if cost_total > 0 else None
+        },
+        "allocation_pct": {
+            name: round(float(share), 2) for name, share in zip(ASSET_CLASSES, allocation(class_values))
+        },
+        "performance": {
+            **performance(timestamps, values, flow_times, flow_amounts),
+            "snapshots": len(rows),
+            "from": rows[0].timestamp if rows else None,
+            "to": rows[-1].timestamp if rows else None,
+            "flows_complete": flows_complete
+        },
+        "timed_out": timed_out
     }
 
 # History endpoints
@@ -535,6 +842,15 @@ async def get_portfolio_overview(request: Request, db: AsyncSession = Depends(ge
 async def create_snapshot(request: Request, db: AsyncSession = Depends(get_db)):
     current_user = await get_current_user(request, db)
     overview = await get_portfolio_overview(request, db)
+    # Partial totals would be stored as permanent history, as in the automatic snapshot job
+    if overview['timed_out']:
+        raise HTTPException(
+            status_code=503,
+            detail="Some prices are not available yet, try again in a moment",
+            headers={"Retry-After": "5"}
+        )
+    if overview['unpriced']:
+        raise HTTPException(status_code=503, detail="Some holdings have no current price")
     
     snapshot = DBHistorySnapshot(
         snapshot_id=str(uuid.uuid4()),
@@ -547,6 +863,7 @@ async def create_snapshot(request: Request, db: AsyncSession = Depends(get_db)):
     db.add(snapshot)
     await db.commit()
     await db.refresh(snapshot)
+    user_versions.bump(current_user.user_id, "history")
     
     return HistorySnapshotResponse(
         id=snapshot.snapshot_id,
@@ -557,27 +874,179 @@ async def create_snapshot(request: Request, db: AsyncSession = Depends(get_db)):
         coins_value_eur=snapshot.coins_value_eur
     )
 
-@api_router.get("/history/snapshots", response_model=List[HistorySnapshotResponse])
-async def get_snapshots(request: Request, db: AsyncSession = Depends(get_db)):
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', '500'))
+HISTORY_MAX_PAGE_SIZE = 5000
+
+def encode_history_cursor(timestamp: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode()
+
+def decode_history_cursor(cursor: str):
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+@api_router.get("/history/snapshots", response_model=List[Union[BucketedSnapshotResponse, HistorySnapshotResponse]])
+async def get_snapshots(
+    request: Request,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    bucket: Optional[str] = Query(None, pattern="^(hour|day)$"),
+    points: Optional[int] = Query(None, ge=3, le=HISTORY_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """Snapshots newest first.
+    
+    Without bucket/points this is a keyset-paginated page of raw snapshots;
+    the next page cursor is returned in the X-Next-Cursor header. With bucket
+    (hour/day) the from/to range is aggregated into OHLC buckets; with points
+    it is reduced to at most that many snapshots using LTTB.
+    """
     current_user = await get_current_user(request, db)
+    return await versioned_response(
+        request,
+        current_user.user_id,
+        "history",
+        lambda: query_snapshots(current_user.user_id, from_, to, limit, cursor, bucket, points, db)
+    )
+
+async def query_snapshots(
+    user_id: str,
+    from_: Optional[datetime],
+    to: Optional[datetime],
+    limit: int,
+    cursor: Optional[str],
+    bucket: Optional[str],
+    points: Optional[int],
+    db: AsyncSession
+):
+    """Returns (snapshots, extra response headers) for get_snapshots"""
+    conditions = [DBHistorySnapshot.user_id == user_id]
+    if from_ is not None:
+        conditions.append(DBHistorySnapshot.timestamp >= from_)
+    if to is not None:
+        conditions.append(DBHistorySnapshot.timestamp < to)
+    
+    if bucket is None and points is None:
+        if cursor:
+            cursor_ts, cursor_id = decode_history_cursor(cursor)
+            conditions.append(or_(
+                DBHistorySnapshot.timestamp < cursor_ts,
+                and_(DBHistorySnapshot.timestamp == cursor_ts, DBHistorySnapshot.id < cursor_id)
+            ))
+        result = await db.execute(
+            select(DBHistorySnapshot)
+            .where(*conditions)
+            .order_by(DBHistorySnapshot.timestamp.desc(), DBHistorySnapshot.id.desc())
+            .limit(limit + 1)
+        )
+        rows = result.scalars().all()
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_history_cursor(rows[-1].timestamp, rows[-1].id)
+        
+        return [
+            HistorySnapshotResponse(
+                id=s.snapshot_id,
+                timestamp=s.timestamp,
+                total_value_eur=s.total_value_eur,
+                crypto_value_eur=s.crypto_value_eur,
+                stocks_value_eur=s.stocks_value_eur,
+                coins_value_eur=s.coins_value_eur
+            )
+            for s in rows
+        ], headers
     
+    # Downsampled range: load only the needed columns, oldest first
     result = await db.execute(
-        select(DBHistorySnapshot)
-        .where(DBHistorySnapshot.user_id == current_user.user_id)
-        .order_by(DBHistorySnapshot.timestamp.desc())
+        select(
+            DBHistorySnapshot.snapshot_id,
+            DBHistorySnapshot.timestamp,
+            DBHistorySnapshot.total_value_eur,
+            DBHistorySnapshot.crypto_value_eur,
+            DBHistorySnapshot.stocks_value_eur,
+            DBHistorySnapshot.coins_value_eur
+        )
+        .where(*conditions)
+        .order_by(DBHistorySnapshot.timestamp.asc(), DBHistorySnapshot.id.asc())
     )
+    rows = result.all()
+    if not rows:
+        return [], {}
     
-    return [
-        HistorySnapshotResponse(
-            id=s.snapshot_id,
-            timestamp=s.timestamp,
-            total_value_eur=s.total_value_eur,
-            crypto_value_eur=s.crypto_value_eur,
-            stocks_value_eur=s.stocks_value_eur,
-            coins_value_eur=s.coins_value_eur
-        )
-        for s in result.scalars().all()
-    ]
+    timestamps = np.array([as_utc(r.timestamp).timestamp() for r in rows])
+    values = np.array([
+        (r.total_value_eur, r.crypto_value_eur, r.stocks_value_eur, r.coins_value_eur) for r in rows
+    ], dtype=np.float64)
+    
+    if bucket is not None:
+        buckets = bucket_ohlc(timestamps, values, BUCKET_SECONDS[bucket])
+        if points is not None and len(buckets["bucket_start"]) > points:
+            keep = lttb(buckets["bucket_start"], buckets["close"], points)
+            buckets = {key: array[keep] for key, array in buckets.items()}
+        snapshots = [
+            BucketedSnapshotResponse(
+                id=f"{bucket}-{int(start)}",
+                timestamp=datetime.fromtimestamp(int(start), tz=timezone.utc),
+                total_value_eur=float(close),
+                crypto_value_eur=float(last[1]),
+                stocks_value_eur=float(last[2]),
+                coins_value_eur=float(last[3]),
+                total_open_eur=float(open_),
+                total_high_eur=float(high),
+                total_low_eur=float(low)
+            )
+            for start, open_, high, low, close, last in zip(
+                buckets["bucket_start"], buckets["open"], buckets["high"],
+                buckets["low"], buckets["close"], buckets["last"]
+            )
+        ]
+    else:
+        snapshots = [
+            HistorySnapshotResponse(
+                id=rows[i].snapshot_id,
+                timestamp=rows[i].timestamp,
+                total_value_eur=rows[i].total_value_eur,
+                crypto_value_eur=rows[i].crypto_value_eur,
+                stocks_value_eur=rows[i].stocks_value_eur,
+                coins_value_eur=rows[i].coins_value_eur
+            )
+            for i in lttb(timestamps, values[:, 0], points)
+        ]
+    
+    snapshots.reverse()
+    return snapshots, {}
+
+# Runtime metrics, only served when METRICS_TOKEN is set and sent as a bearer token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+@api_router.get("/metrics")
+async def get_metrics(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return {
+        "price_cache": price_cache.stats(),
+        "session_cache": session_cache.stats(),
+        "password_pool": password_pool_stats(),
+        "coin_scraper": coin_scraper.stats(),
+        "session_reaper": session_reaper.stats(),
+        "snapshot_job": snapshot_job.stats(),
+        "price_history": price_history.stats(),
+        "valuation": valuation_engine.stats(),
+        "response_cache": response_cache_stats(),
+        "price_providers": price_providers.stats(),
+        "startup": sdks.report()
+    }
 
 app.include_router(api_router)
 
@@ -587,20 +1056,21 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', 'https://portfolio-tracker.onrender.com,http://localhost:3000,*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# Mount static files if build exists
-if FRONTEND_BUILD and (FRONTEND_BUILD / "static").exists():
-    app.mount("/static", StaticFiles(directory=str(FRONTEND_BUILD / "static")), name="static")
-
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup():
-    await init_db()
+    sdks.record("import", time.perf_counter() - IMPORT_STARTED)
+    with sdks.timed("init_db"):
+        await init_db()
     if FRONTEND_BUILD:
         logger.info(f"Frontend build found at: {FRONTEND_BUILD}")
+        with sdks.timed("frontend_index"):
+            frontend_assets.load(FRONTEND_BUILD)
     else:
         logger.warning("Frontend build not found - serving API only")
         logger.warning(f"Working directory: {Path.cwd()}")
@@ -611,23 +1081,61 @@ async def startup():
             has_index = (path / "index.html").exists() if exists else False
             logger.warning(f"  {i+1}. {path} -> exists: {exists}, has_index: {has_index}")
     logger.info("Database tables created successfully")
+    valuation_engine.start()
+    if PRICE_REFRESHER_ENABLED:
+        price_refresher.start()
+        logger.info("Background price refresher started")
+    if SESSION_REAPER_ENABLED:
+        session_reaper.start()
+    if AUTO_SNAPSHOT_ENABLED:
+        snapshot_job.start()
+    if PRICE_HISTORY_ENABLED:
+        price_history.start()
+    sdks.log_report()
+    if SDK_WARMUP_ENABLED:
+        # Price SDKs load in the background so the first request does not wait for them
+        asyncio.ensure_future(sdks.warm_up_in_background())
+
+@app.on_event("shutdown")
+async def shutdown():
+    await price_refresher.stop()
+    await session_reaper.stop()
+    await snapshot_job.stop()
+    await price_history.stop()
+    valuation_engine.stop()
+    await close_http_client()
 
 # Serve React app - React handles all routing
+def static_response(asset, request: Request):
+    encoding, variant = frontend_assets.select(asset, request.headers.get("accept-encoding", ""))
+    headers = {"Cache-Control": asset.cache_control, "ETag": variant.etag}
+    if len(asset.variants) > 1:
+        headers["Vary"] = "Accept-Encoding"
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    
+    if etag_matches(request, variant.etag):
+        return Response(status_code=304, headers=headers)
+    
+    if variant.data is not None:
+        return Response(content=variant.data, media_type=asset.media_type, headers=headers)
+    return FileResponse(variant.path, media_type=asset.media_type, headers=headers)
+
 @app.get("/{full_path:path}")
-async def catch_all(full_path: str):
+async def catch_all(full_path: str, request: Request):
     # Skip API routes
     if full_path.startswith("api/") or full_path in ["docs", "openapi.json", "redoc"]:
         raise HTTPException(status_code=404)
     
-    # Serve static files
-    if FRONTEND_BUILD:
-        file_path = FRONTEND_BUILD / full_path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-        
-        # Serve index.html for client-side routing
-        index_path = FRONTEND_BUILD / "index.html"
-        if index_path.exists():
-            return FileResponse(index_path)
+    # Serve static files from the in-memory index built at startup
+    asset = frontend_assets.get(full_path)
+    if asset is not None:
+        return static_response(asset, request)
+    
+    # Serve index.html for client-side routing, but not for missing bundles
+    if not full_path.startswith("static/"):
+        index = frontend_assets.get("index.html")
+        if index is not None:
+            return static_response(index, request)
     
     raise HTTPException(status_code=404)
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import logging
+import os
+from sqlalchemy import select, delete
+
+from database import AsyncSessionLocal, UserSession as DBUserSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_REAPER_ENABLED = os.environ.get('SESSION_REAPER_ENABLED', 'true').lower() == 'true'
+SESSION_REAPER_INTERVAL = float(os.environ.get('SESSION_REAPER_INTERVAL_SECONDS', '3600'))
+SESSION_REAPER_BATCH_SIZE = int(os.environ.get('SESSION_REAPER_BATCH_SIZE', '1000'))
+
+async def reap_expired_sessions(batch_size: int = SESSION_REAPER_BATCH_SIZE) -> int:
+    """Delete expired sessions in batches, one short transaction per batch; returns rows removed"""
+    removed = 0
+    now = datetime.now(timezone.utc)
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(DBUserSession.id)
+                .where(DBUserSession.expires_at < now)
+                .limit(batch_size)
+            )
+            ids = result.scalars().all()
+            if ids:
+                await db.execute(delete(DBUserSession).where(DBUserSession.id.in_(ids)))
+                await db.commit()
+        removed += len(ids)
+        if len(ids) < batch_size:
+            return removed
+        # Let request handlers in between batches
+        await asyncio.sleep(0)
+
+class SessionReaper:
+    """Periodic background job removing expired rows from user_sessions"""
+
+    def __init__(self, interval: float = SESSION_REAPER_INTERVAL):
+        self.interval = interval
+        self.runs = 0
+        self.rows_removed = 0
+        self.last_removed = 0
+        self.last_run_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        removed = await reap_expired_sessions()
+        self.runs += 1
+        self.rows_removed += removed
+        self.last_removed = removed
+        self.last_run_at = datetime.now(timezone.utc)
+        if removed:
+            logger.info(f"Removed {removed} expired sessions")
+        return removed
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Session reaper failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "rows_removed": self.rows_removed,
+            "last_removed": self.last_removed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None
+        }
+
+session_reaper = SessionReaper()
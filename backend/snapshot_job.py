@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import logging
+import os
+import uuid
+import numpy as np
+from sqlalchemy import insert
+
+from database import AsyncSessionLocal, HistorySnapshot as DBHistorySnapshot
+from holdings import load_holdings_rows, row_price_key
+from prices import resolve_prices
+from response_cache import user_versions
+
+logger = logging.getLogger(__name__)
+
+AUTO_SNAPSHOT_ENABLED = os.environ.get('AUTO_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+AUTO_SNAPSHOT_INTERVAL = float(os.environ.get('AUTO_SNAPSHOT_INTERVAL_SECONDS', '3600'))
+AUTO_SNAPSHOT_PRICE_DEADLINE = float(os.environ.get('AUTO_SNAPSHOT_PRICE_DEADLINE_SECONDS', '60'))
+
+ASSET_CLASSES = ('crypto', 'stocks', 'coins')
+
+async def load_all_holdings(db) -> list:
+    """Return (user_id, asset class, price key, quantity) for every holding of every user"""
+    rows = await load_holdings_rows(db)
+    return [(row.user_id, row.asset_class, row_price_key(row), row.quantity) for row in rows]
+
+def compute_user_totals(holdings: list, prices: dict):
+    """Sum holdings per user and asset class in one vectorised pass.
+
+    Returns (user_ids, values, complete) where values is an (n_users, 3) array
+    of crypto/stocks/coins values and complete flags users whose holdings all
+    have a price.
+    """
+    user_ids, user_index = np.unique([h[0] for h in holdings], return_inverse=True)
+    class_index = np.array([ASSET_CLASSES.index(h[1]) for h in holdings])
+    price = np.array([prices.get(h[2]) if prices.get(h[2]) is not None else np.nan for h in holdings], dtype=np.float64)
+    quantity = np.array([h[3] for h in holdings], dtype=np.float64)
+
+    missing = np.isnan(price)
+    value = np.where(missing, 0.0, price * quantity)
+    cells = user_index * len(ASSET_CLASSES) + class_index
+    values = np.bincount(cells, weights=value, minlength=len(user_ids) * len(ASSET_CLASSES))
+    complete = np.bincount(user_index, weights=missing, minlength=len(user_ids)) == 0
+    return user_ids, values.reshape(len(user_ids), len(ASSET_CLASSES)), complete
+
+class SnapshotJob:
+    """Periodic history snapshots for every user, pricing each distinct holding once per run.
+
+    Users with a holding that could not be priced are skipped for the run
+    rather than recorded with a value that is too low.
+    """
+
+    def __init__(self, interval: float = AUTO_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self.runs = 0
+        self.last_inserted = 0
+        self.last_skipped = 0
+        self.last_run_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        # The price lookups can take up to the deadline, so no connection is held across them
+        async with AsyncSessionLocal() as db:
+            holdings = await load_all_holdings(db)
+        if not holdings:
+            return 0
+
+        price_keys = {h[2] for h in holdings}
+        prices, _ = await resolve_prices({key: key for key in price_keys}, deadline=AUTO_SNAPSHOT_PRICE_DEADLINE)
+        user_ids, values, complete = compute_user_totals(holdings, prices)
+
+        timestamp = datetime.now(timezone.utc)
+        rows = [
+            {
+                "snapshot_id": str(uuid.uuid4()),
+                "user_id": str(user_id),
+                "timestamp": timestamp,
+                "total_value_eur": round(float(crypto + stocks + coins), 2),
+                "crypto_value_eur": round(float(crypto), 2),
+                "stocks_value_eur": round(float(stocks), 2),
+                "coins_value_eur": round(float(coins), 2)
+            }
+            for user_id, (crypto, stocks, coins), ok in zip(user_ids, values, complete)
+            if ok
+        ]
+        if rows:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(DBHistorySnapshot), rows)
+                await db.commit()
+            for row in rows:
+                user_versions.bump(row["user_id"], "history")
+
+        self.runs += 1
+        self.last_inserted = len(rows)
+        self.last_skipped = len(user_ids) - len(rows)
+        self.last_run_at = timestamp
+        logger.info(
+            f"Automatic snapshot: {len(rows)} users from {len(price_keys)} distinct prices"
+            f" ({self.last_skipped} skipped for missing prices)"
+        )
+        return len(rows)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Automatic snapshot failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "last_inserted": self.last_inserted,
+            "last_skipped": self.last_skipped,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None
+        }
+
+snapshot_job = SnapshotJob()
@@ -0,0 +1,141 @@
+from pathlib import Path
+from typing import Optional
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_MEMORY_MAX_BYTES = int(os.environ.get('STATIC_MEMORY_MAX_BYTES', str(512 * 1024)))
+STATIC_COMPRESS_MIN_BYTES = 1024
+
+# CRA emits content-hashed names such as static/js/main.1a2b3c4d.js
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.(?:chunk\.)?[a-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/manifest+json')
+# Preferred first when the client accepts several
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+class StaticVariant:
+    """One encoding of an asset, held in memory when small enough"""
+
+    __slots__ = ('path', 'size', 'etag', 'data')
+
+    def __init__(self, path: Optional[Path], size: int, etag: str, data: Optional[bytes] = None):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.data = data
+
+class StaticAsset:
+    def __init__(self, media_type: str, cache_control: str, variants: dict):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.variants = variants  # encoding ('identity', 'br', 'gzip') -> StaticVariant
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Encodings listed in an Accept-Encoding header, minus those refused with q=0"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if name:
+            accepted.add(name)
+    return accepted
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+class StaticAssets:
+    """In-memory index of the frontend build served without touching the filesystem per request.
+
+    The tree is scanned once: each file gets its media type, cache policy,
+    ETag and the precompressed .br/.gz siblings found next to it. Files up to
+    STATIC_MEMORY_MAX_BYTES are kept in memory; small compressible files
+    without a precompressed sibling are gzipped at load time.
+    """
+
+    def __init__(self, memory_max_bytes: int = STATIC_MEMORY_MAX_BYTES):
+        self.memory_max_bytes = memory_max_bytes
+        self.root: Optional[Path] = None
+        self._assets: dict = {}  # relative posix path -> StaticAsset
+
+    def load(self, root: Path):
+        self.root = root
+        assets = {}
+        for path in root.rglob('*'):
+            if not path.is_file() or path.suffix in ('.gz', '.br'):
+                continue
+            relative = path.relative_to(root).as_posix()
+            assets[relative] = self._index_file(relative, path)
+        self._assets = assets
+        in_memory = sum(1 for a in assets.values() if a.variants['identity'].data is not None)
+        logger.info(f"Indexed {len(assets)} frontend files ({in_memory} in memory) from {root}")
+
+    def _read_variant(self, path: Path, etag_suffix: str = '') -> StaticVariant:
+        stat = path.stat()
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}{etag_suffix}"'
+        data = path.read_bytes() if stat.st_size <= self.memory_max_bytes else None
+        return StaticVariant(path, stat.st_size, etag, data)
+
+    def _index_file(self, relative: str, path: Path) -> StaticAsset:
+        media_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if media_type.startswith('text/') or media_type == 'application/javascript':
+            media_type += '; charset=utf-8'
+        hashed = relative.startswith('static/') and HASHED_NAME.search(path.name)
+        cache_control = IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL
+
+        identity = self._read_variant(path)
+        variants = {'identity': identity}
+        if is_compressible(media_type) and identity.size >= STATIC_COMPRESS_MIN_BYTES:
+            for encoding, suffix in ENCODINGS:
+                sibling = path.with_name(path.name + suffix)
+                if sibling.is_file():
+                    variants[encoding] = self._read_variant(sibling, f'-{encoding}')
+            if 'gzip' not in variants and identity.data is not None:
+                data = gzip.compress(identity.data, compresslevel=9, mtime=0)
+                variants['gzip'] = StaticVariant(None, len(data), identity.etag[:-1] + '-gzip"', data)
+        return StaticAsset(media_type, cache_control, variants)
+
+    def get(self, relative: str) -> Optional[StaticAsset]:
+        return self._assets.get(relative)
+
+    def select(self, asset: StaticAsset, accept_encoding: str):
+        """Return (encoding, variant) to send: brotli, then gzip, then the plain file"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in asset.variants and encoding in accepted:
+                return encoding, asset.variants[encoding]
+        return 'identity', asset.variants['identity']
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+def precompress_tree(root: Path, min_bytes: int = STATIC_COMPRESS_MIN_BYTES) -> int:
+    """Write .gz (and .br when brotli is installed) next to each compressible file; returns files written"""
+    written = 0
+    for path in root.rglob('*'):
+        if not path.is_file() or path.suffix in ('.gz', '.br'):
+            continue
+        media_type = mimetypes.guess_type(path.name)[0] or ''
+        if not is_compressible(media_type) or path.stat().st_size < min_bytes:
+            continue
+        data = path.read_bytes()
+        path.with_name(path.name + '.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        written += 1
+        if brotli is not None:
+            path.with_name(path.name + '.br').write_bytes(brotli.compress(data, quality=11))
+            written += 1
+    return written
+
+frontend_assets = StaticAssets()
@@ -0,0 +1,106 @@
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from cache import TTLCache
+from http_client import run_blocking
+from sdk_loader import sdks
+
+logger = logging.getLogger(__name__)
+
+STOCK_BATCH_WINDOW = float(os.environ.get('STOCK_BATCH_WINDOW_SECONDS', '0.05'))
+STOCK_BATCH_MAX = int(os.environ.get('STOCK_BATCH_MAX', '100'))
+STOCK_CURRENCY_TTL = float(os.environ.get('STOCK_CURRENCY_TTL_SECONDS', '86400'))
+
+# yfinance pulls in pandas; imported on first download
+yfinance_sdk = sdks.register('yfinance', 'yfinance')
+
+def download_last_closes(symbols: list) -> dict:
+    """Fetch the last close of many symbols with one multi-ticker download"""
+    yf = yfinance_sdk.get()
+    if yf is None:
+        raise RuntimeError("yfinance unavailable")
+    data = yf.download(
+        symbols, period='5d', interval='1d', auto_adjust=False,
+        progress=False, threads=True, multi_level_index=True
+    )
+    if data.empty:
+        return {}
+    closes = data['Close'].ffill()
+    if closes.empty:
+        return {}
+    last = closes.iloc[-1].dropna()
+    return {symbol: float(price) for symbol, price in last.items()}
+
+def lookup_currency(symbol: str) -> Optional[str]:
+    yf = yfinance_sdk.get()
+    if yf is None:
+        return None
+    try:
+        return yf.Ticker(symbol).fast_info['currency']
+    except Exception:
+        return None
+
+class StockQuoteBatcher:
+    """Coalesce stock quote requests made within a short window into one yfinance download.
+
+    Quote currencies rarely change, so they are cached per symbol for
+    STOCK_CURRENCY_TTL_SECONDS and only looked up for new symbols.
+    """
+
+    def __init__(self, window: float = STOCK_BATCH_WINDOW, max_batch: int = STOCK_BATCH_MAX):
+        self.window = window
+        self.max_batch = max_batch
+        self.currencies = TTLCache(maxsize=4096, ttl=STOCK_CURRENCY_TTL)
+        self._pending: dict = {}  # symbol -> asyncio.Future
+        self._flush_handle = None
+
+    async def get_quote(self, symbol: str):
+        """Return (last close, quote currency) for a symbol, or (None, None); the currency is None when unknown"""
+        future = self._pending.get(symbol)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[symbol] = future
+            if len(self._pending) >= self.max_batch:
+                self._flush_now()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush_now)
+        return await asyncio.shield(future)
+
+    async def get_quotes(self, symbols) -> dict:
+        quotes = await asyncio.gather(*[self.get_quote(symbol) for symbol in symbols])
+        return dict(zip(symbols, quotes))
+
+    def _flush_now(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._fetch_batch(batch))
+
+    async def _fetch_batch(self, batch: dict):
+        symbols = list(batch)
+        try:
+            closes = await run_blocking(download_last_closes, symbols)
+            priced = [symbol for symbol in symbols if symbol in closes]
+            currencies = await asyncio.gather(*[
+                self.currencies.get_or_load(symbol, lambda symbol=symbol: run_blocking(lookup_currency, symbol))
+                for symbol in priced
+            ])
+            currency_of = dict(zip(priced, currencies))
+        except Exception as e:
+            logger.warning(f"Stock batch download failed for {len(symbols)} symbols: {e}")
+            closes, currency_of = {}, {}
+
+        for symbol, future in batch.items():
+            if future.done():
+                continue
+            if symbol in closes:
+                # An unknown currency is left as None rather than guessed: a GBp or JPY close read as USD is far off
+                future.set_result((closes[symbol], currency_of.get(symbol)))
+            else:
+                future.set_result((None, None))
+
+stock_quotes = StockQuoteBatcher()
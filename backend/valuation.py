@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from typing import Optional
+import os
+import time
+
+from holdings import load_holdings_rows, row_holding_key, row_price_key
+from prices import resolve_prices, add_price_listener, remove_price_listener, PRICE_TTLS
+
+VALUATION_MAX_USERS = int(os.environ.get('VALUATION_MAX_USERS', '10000'))
+
+ASSET_CLASSES = ('crypto', 'stocks', 'coins')
+
+class Position:
+    """Holdings of one user on one price key, aggregated across asset rows"""
+
+    __slots__ = ('asset_class', 'quantity', 'holding_keys')
+
+    def __init__(self, asset_class: str):
+        self.asset_class = asset_class
+        self.quantity = 0.0
+        self.holding_keys = set()
+
+class UserPortfolio:
+    """In-memory valuation state of one user: positions, last prices and running class totals"""
+
+    def __init__(self):
+        self.positions: dict = {}  # price key -> Position
+        self.prices: dict = {}  # price key -> last known EUR price, None when unavailable
+        self.priced_at: dict = {}  # price key -> monotonic time the price was received
+        self.values = dict.fromkeys(ASSET_CLASSES, 0.0)
+        self.counts = dict.fromkeys(ASSET_CLASSES, 0)
+
+    def add(self, asset_class: str, holding_key: str, price_key: tuple, quantity: float):
+        position = self.positions.get(price_key)
+        if position is None:
+            position = self.positions[price_key] = Position(asset_class)
+            self.prices.setdefault(price_key, None)
+        position.quantity += quantity
+        position.holding_keys.add(holding_key)
+        self.counts[asset_class] += 1
+        self.values[asset_class] += (self.prices[price_key] or 0.0) * quantity
+
+    def remove(self, asset_class: str, holding_key: str, price_key: tuple, quantity: float) -> bool:
+        """Remove one holding; returns True when the position is gone"""
+        position = self.positions.get(price_key)
+        if position is None or holding_key not in position.holding_keys:
+            return False
+        position.quantity -= quantity
+        position.holding_keys.discard(holding_key)
+        self.counts[asset_class] -= 1
+        self.values[asset_class] -= (self.prices[price_key] or 0.0) * quantity
+        if position.holding_keys:
+            return False
+        del self.positions[price_key]
+        del self.prices[price_key]
+        self.priced_at.pop(price_key, None)
+        return True
+
+    def apply_price(self, price_key: tuple, price: Optional[float], at: float = None):
+        """Set a position's price; None drops it from the totals until a new price arrives"""
+        position = self.positions.get(price_key)
+        if position is None:
+            return
+        previous = self.prices[price_key] or 0.0
+        self.prices[price_key] = price
+        self.values[position.asset_class] += ((price or 0.0) - previous) * position.quantity
+        if price is None:
+            self.priced_at.pop(price_key, None)
+        else:
+            self.priced_at[price_key] = time.monotonic() if at is None else at
+
+    def needs_price(self, price_key: tuple, now: float) -> bool:
+        """True when the price is missing or older than the shared cache would keep it"""
+        priced_at = self.priced_at.get(price_key)
+        return priced_at is None or now - priced_at >= PRICE_TTLS[price_key[0]]
+
+    def holding_keys_of(self, price_keys) -> list:
+        return [key for price_key in price_keys for key in self.positions[price_key].holding_keys]
+
+    def overview(self) -> dict:
+        crypto, stocks, coins = (self.values[c] for c in ASSET_CLASSES)
+        return {
+            "total_value_eur": round(crypto + stocks + coins, 2),
+            "crypto_value_eur": round(crypto, 2),
+            "stocks_value_eur": round(stocks, 2),
+            "coins_value_eur": round(coins, 2),
+            "crypto_count": self.counts['crypto'],
+            "stocks_count": self.counts['stocks'],
+            "coins_count": self.counts['coins']
+        }
+
+async def load_user_holdings(user_id: str, db) -> list:
+    """Return (asset class, holding key, price key, quantity) for each holding of a user"""
+    rows = await load_holdings_rows(db, user_id)
+    return [(row.asset_class, row_holding_key(row), row_price_key(row), row.quantity) for row in rows]
+
+class ValuationEngine:
+    """Per-user portfolio totals kept up to date from price ticks and holding changes.
+
+    A user's positions are loaded from the database on their first overview and
+    then maintained in memory: price changes from the refresher adjust the
+    totals of every user holding that price key, and the create/delete
+    endpoints add or remove holdings. Least recently read users are dropped
+    beyond max_users and reloaded on demand.
+    """
+
+    def __init__(self, max_users: int = VALUATION_MAX_USERS):
+        self.max_users = max_users
+        self.loads = 0
+        self.ticks_applied = 0
+        self._portfolios: OrderedDict = OrderedDict()  # user_id -> UserPortfolio
+        self._holders: dict = {}  # price key -> set of user_ids
+        self._loading: dict = {}  # user_id -> loads in flight
+        self._stale: set = set()  # users whose in-flight load missed a holding change
+        self._started = False
+
+    def _on_price_change(self, price_key: tuple, price: float):
+        now = time.monotonic()
+        for user_id in self._holders.get(price_key, ()):
+            self._portfolios[user_id].apply_price(price_key, price, now)
+            self.ticks_applied += 1
+
+    def _install(self, user_id: str, portfolio: UserPortfolio):
+        self._portfolios[user_id] = portfolio
+        for price_key in portfolio.positions:
+            self._holders.setdefault(price_key, set()).add(user_id)
+        while len(self._portfolios) > self.max_users:
+            self.evict(next(iter(self._portfolios)))
+
+    def evict(self, user_id: str):
+        portfolio = self._portfolios.pop(user_id, None)
+        if portfolio is None:
+            return
+        for price_key in portfolio.positions:
+            self._release(price_key, user_id)
+
+    def _release(self, price_key: tuple, user_id: str):
+        holders = self._holders.get(price_key)
+        if holders is not None:
+            holders.discard(user_id)
+            if not holders:
+                del self._holders[price_key]
+
+    def add_holding(self, user_id: str, asset_class: str, holding_key: str, price_key: tuple, quantity: float):
+        portfolio = self._portfolios.get(user_id)
+        if portfolio is None:
+            self._mark_stale(user_id)
+            return
+        portfolio.add(asset_class, holding_key, price_key, quantity)
+        self._holders.setdefault(price_key, set()).add(user_id)
+
+    def remove_holding(self, user_id: str, asset_class: str, holding_key: str, price_key: tuple, quantity: float):
+        portfolio = self._portfolios.get(user_id)
+        if portfolio is None:
+            self._mark_stale(user_id)
+            return
+        if portfolio.remove(asset_class, holding_key, price_key, quantity):
+            self._release(price_key, user_id)
+
+    def _mark_stale(self, user_id: str):
+        # A load of this user still in flight may have read the holdings before the change
+        if user_id in self._loading:
+            self._stale.add(user_id)
+
+    async def _load(self, user_id: str, db) -> UserPortfolio:
+        self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        try:
+            holdings = await load_user_holdings(user_id, db)
+        finally:
+            self._loading[user_id] -= 1
+            stale = user_id in self._stale
+            if not self._loading[user_id]:
+                del self._loading[user_id]
+                self._stale.discard(user_id)
+        portfolio = UserPortfolio()
+        for asset_class, holding_key, price_key, quantity in holdings:
+            portfolio.add(asset_class, holding_key, price_key, quantity)
+        self.loads += 1
+        if not stale and user_id not in self._portfolios:
+            self._install(user_id, portfolio)
+        return portfolio
+
+    async def get_overview(self, user_id: str, db, reprice: bool = False) -> dict:
+        """Totals and counts for a user, plus the holdings without a current price.
+
+        Prices received from ticks or earlier lookups are reused for as long as
+        the shared cache keeps them (PRICE_TTLS); missing or older ones are
+        resolved again, every position is when reprice is set (no refresher
+        feeding ticks). timed_out lists holdings whose lookup hit the deadline,
+        unpriced those whose price could not be fetched; neither counts
+        towards the totals.
+        """
+        portfolio = self._portfolios.get(user_id)
+        if portfolio is None:
+            portfolio = await self._load(user_id, db)
+        else:
+            self._portfolios.move_to_end(user_id)
+
+        now = time.monotonic()
+        pending = [key for key in portfolio.positions if reprice or portfolio.needs_price(key, now)]
+        timed_out = []
+        if pending:
+            prices, timed_out = await resolve_prices({key: key for key in pending})
+            for price_key, price in prices.items():
+                portfolio.apply_price(price_key, price)
+            for price_key in timed_out:
+                if portfolio.needs_price(price_key, now):
+                    portfolio.apply_price(price_key, None)
+        waiting = set(timed_out)
+        unpriced = [key for key, price in portfolio.prices.items() if price is None and key not in waiting]
+        return {
+            **portfolio.overview(),
+            "timed_out": portfolio.holding_keys_of(key for key in timed_out if key in portfolio.positions),
+            "unpriced": portfolio.holding_keys_of(unpriced)
+        }
+
+    def start(self):
+        if not self._started:
+            add_price_listener(self._on_price_change)
+            self._started = True
+
+    def stop(self):
+        if self._started:
+            remove_price_listener(self._on_price_change)
+            self._started = False
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._portfolios),
+            "price_keys": len(self._holders),
+            "loads": self.loads,
+            "ticks_applied": self.ticks_applied
+        }
+
+valuation_engine = ValuationEngine()
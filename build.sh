@@ -7,6 +7,7 @@ pip install -r requirements.txt
 echo "� Running database migration..."
 cd backend
 python migrate_add_password.py || echo "⚠️  Migration already applied or not needed"
+python migrate_add_indexes.py || echo "⚠️  Index migration failed, continuing"
 cd ..
 
 echo "�🔨 Installing frontend dependencies..."
@@ -15,5 +16,9 @@ npm install --legacy-peer-deps
 
 echo "🔨 Building React frontend..."
 npm run build
+cd ..
+
+echo "🔨 Precompressing frontend assets..."
+python backend/precompress_frontend.py
 
 echo "✅ Build complete!"
@@ -34,22 +34,42 @@ function Dashboard() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
+  // Live price and total updates while the dashboard is shown
+  useEffect(() => {
+    if (loading) return undefined;
+    const source = new EventSource(`${API}/portfolio/stream`, { withCredentials: true });
+    source.addEventListener('portfolio', (event) => {
+      const delta = JSON.parse(event.data);
+      if (delta.prices) {
+        setPrices((prev) => {
+          const next = { ...prev };
+          Object.entries(delta.prices).forEach(([key, value]) => {
+            next[key] = { ...prev[key], ...value };
+          });
+          return next;
+        });
+      }
+      if (delta.totals) {
+        setOverview((prev) => ({ ...prev, ...delta.totals }));
+      }
+    });
+    return () => source.close();
+  }, [loading]);
+
   const loadData = async () => {
     try {
       setLoading(true);
-      const [overviewRes, cryptosRes, stocksRes, coinsRes] = await Promise.all([
+      const [overviewRes, holdingsRes] = await Promise.all([
         axios.get(`${API}/portfolio/overview`, { withCredentials: true }),
-        axios.get(`${API}/crypto`, { withCredentials: true }),
-        axios.get(`${API}/stocks`, { withCredentials: true }),
-        axios.get(`${API}/coins`, { withCredentials: true })
+        axios.get(`${API}/holdings`, { withCredentials: true })
       ]);
 
       setOverview(overviewRes.data);
-      setCryptos(cryptosRes.data);
-      setStocks(stocksRes.data);
-      setCoins(coinsRes.data);
+      setCryptos(holdingsRes.data.crypto);
+      setStocks(holdingsRes.data.stocks);
+      setCoins(holdingsRes.data.coins);
 
-      await loadPrices(cryptosRes.data, stocksRes.data, coinsRes.data);
+      await loadPrices();
     } catch (error) {
       console.error('Error loading data:', error);
       toast.error('Erreur lors du chargement des données');
@@ -58,37 +78,16 @@ function Dashboard() {
     }
   };
 
-  const loadPrices = async (cryptosList, stocksList, coinsList) => {
-    const newPrices = {};
-    
-    for (const crypto of cryptosList) {
-      try {
-        const res = await axios.get(`${API}/crypto/${crypto.id}/price`, { withCredentials: true });
-        newPrices[`crypto-${crypto.id}`] = res.data;
-      } catch (error) {
-        console.error(`Error loading price for ${crypto.symbol}:`, error);
-      }
-    }
-
-    for (const stock of stocksList) {
-      try {
-        const res = await axios.get(`${API}/stocks/${stock.id}/price`, { withCredentials: true });
-        newPrices[`stock-${stock.id}`] = res.data;
-      } catch (error) {
-        console.error(`Error loading price for ${stock.symbol}:`, error);
-      }
-    }
-
-    for (const coin of coinsList) {
-      try {
-        const res = await axios.get(`${API}/coins/${coin.id}/price`, { withCredentials: true });
-        newPrices[`coin-${coin.id}`] = res.data;
-      } catch (error) {
-        console.error(`Error loading price for ${coin.name}:`, error);
-      }
+  const loadPrices = async () => {
+    try {
+      const res = await axios.get(`${API}/portfolio/prices`, { withCredentials: true });
+      Object.entries(res.data.errors).forEach(([key, error]) => {
+        console.error(`Error loading price for ${key}:`, error);
+      });
+      setPrices(res.data.prices);
+    } catch (error) {
+      console.error('Error loading prices:', error);
     }
-
-    setPrices(newPrices);
   };
 
   const handleAddCrypto = async (e) => {
@@ -8,6 +8,8 @@ import { ArrowLeft } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import { toast } from 'sonner';
 
+const HISTORY_POINTS = 500;
+
 function History() {
   const navigate = useNavigate();
   const [snapshots, setSnapshots] = useState([]);
@@ -20,7 +22,11 @@ function History() {
   const loadSnapshots = async () => {
     try {
       setLoading(true);
-      const res = await axios.get(`${API}/history/snapshots`, { withCredentials: true });
+      // Let the server reduce long histories to a chart-sized series
+      const res = await axios.get(`${API}/history/snapshots`, {
+        params: { points: HISTORY_POINTS },
+        withCredentials: true
+      });
       setSnapshots(res.data.reverse());
     } catch (error) {
       console.error('Error loading snapshots:', error);
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend is a flat set of modules run from its own directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('PRICE_PROVIDER', 'fake')
+
+from price_providers import PRICE_SOURCES, PriceProvider, price_providers  # noqa: E402
+from prices import price_cache  # noqa: E402
+
+
+class StubProvider(PriceProvider):
+    """Prices every key at a fixed value after a delay, counting calls"""
+
+    name = 'stub'
+
+    def __init__(self, price=10.0, delay=0.0, fail=False):
+        self.price = price
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    async def get_prices(self, price_keys: list) -> dict:
+        self.calls.append(list(price_keys))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {key: None if key[1] == 'UNKNOWN' else self.price for key in price_keys}
+
+
+@pytest.fixture
+def stub_providers():
+    previous = {source: price_providers.get(source) for source in PRICE_SOURCES}
+    stubs = {source: StubProvider() for source in PRICE_SOURCES}
+    for source, stub in stubs.items():
+        price_providers.register(source, stub)
+    price_cache.clear()
+    yield stubs
+    for source, provider in previous.items():
+        price_providers.register(source, provider)
+    price_cache.clear()
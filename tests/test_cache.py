@@ -0,0 +1,122 @@
+import asyncio
+
+from cache import TTLCache
+
+
+class CountingLoader:
+    def __init__(self, value='v', delay=0.01):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, *args):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache()
+    loader = CountingLoader()
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_load('k', loader) for _ in range(50)])
+
+    assert asyncio.run(run()) == ['v'] * 50
+    assert loader.calls == 1
+    assert cache.get('k') == 'v'
+    assert cache.stats()['inflight'] == 0
+
+
+def test_cancelled_caller_does_not_abort_shared_load():
+    cache = TTLCache()
+    loader = CountingLoader(delay=0.05)
+
+    async def run():
+        first = asyncio.ensure_future(cache.get_or_load('k', loader))
+        second = asyncio.ensure_future(cache.get_or_load('k', loader))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ('v', True)
+    assert loader.calls == 1
+    assert cache.get('k') == 'v'
+
+
+def test_none_results_are_not_cached():
+    cache = TTLCache()
+    loader = CountingLoader(value=None)
+
+    async def run():
+        assert await cache.get_or_load('k', loader) is None
+        assert await cache.get_or_load('k', loader) is None
+
+    asyncio.run(run())
+    assert loader.calls == 2
+    assert len(cache) == 0
+
+
+def test_expired_entries_are_reloaded():
+    cache = TTLCache(ttl=0.01)
+    loader = CountingLoader()
+
+    async def run():
+        await cache.get_or_load('k', loader)
+        await asyncio.sleep(0.02)
+        await cache.get_or_load('k', loader)
+
+    asyncio.run(run())
+    assert loader.calls == 2
+
+
+def test_load_many_batches_misses_and_returns_hits():
+    cache = TTLCache()
+    cache.set('a', 1)
+    batches = []
+
+    async def loader(keys):
+        batches.append(sorted(keys))
+        await asyncio.sleep(0.01)
+        return {key: key.upper() for key in keys}
+
+    async def run():
+        values, tasks = cache.load_many(['a', 'b', 'c'], loader)
+        return values, {key: await task for key, task in tasks.items()}
+
+    values, loaded = asyncio.run(run())
+    assert values == {'a': 1}
+    assert loaded == {'b': 'B', 'c': 'C'}
+    assert batches == [['b', 'c']]
+    assert cache.get('b') == 'B'
+    assert cache.stats()['inflight'] == 0
+
+
+def test_load_many_joins_loads_in_flight():
+    cache = TTLCache()
+    batches = []
+
+    async def loader(keys):
+        batches.append(sorted(keys))
+        await asyncio.sleep(0.02)
+        return {key: None if key == 'missing' else key for key in keys}
+
+    async def run():
+        _, first = cache.load_many(['a', 'missing'], loader)
+        _, second = cache.load_many(['a', 'b'], loader)
+        assert second['a'] is first['a']
+        await asyncio.gather(*first.values(), *second.values())
+
+    asyncio.run(run())
+    assert batches == [['a', 'missing'], ['b']]
+    assert cache.get('missing') is None
+    assert 'missing' not in cache._data
+
+
+def test_lookup_counts_hits_and_misses():
+    cache = TTLCache()
+    assert cache.lookup('k') is None
+    cache.set('k', 'v')
+    assert cache.lookup('k') == 'v'
+    assert cache.lookup('k') == 'v'
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 1)
@@ -0,0 +1,44 @@
+import asyncio
+
+import coin_scraper
+from coin_scraper import PageEntry, extract_prices
+from price_providers import CoinScraperPriceProvider
+
+PAGE = '<div class="a">1,5 €</div><div class="b">2.25</div>'.encode()
+
+
+def test_extract_prices_parses_each_selector():
+    assert extract_prices(PAGE, ['.a', '.b', '.missing']) == {'.a': 1.5, '.b': 2.25, '.missing': None}
+
+
+def test_invalid_selector_only_fails_itself():
+    assert extract_prices(PAGE, ['.a', 'div[']) == {'.a': 1.5, 'div[': None}
+
+
+def test_get_prices_parses_a_page_once(monkeypatch):
+    scraper = coin_scraper.CoinScraper()
+    entry = PageEntry(None, None, PAGE)
+
+    async def fetch_page(url):
+        return entry
+
+    monkeypatch.setattr(scraper, 'fetch_page', fetch_page)
+
+    async def run():
+        first = await scraper.get_prices('https://example.com', ['.a', 'div['])
+        second = await scraper.get_prices('https://example.com', ['.a', '.b', 'div['])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {'.a': 1.5, 'div[': None}
+    assert second == {'.a': 1.5, '.b': 2.25, 'div[': None}
+    # The bad selector's None is kept, so only the new selector caused a second parse
+    assert scraper.parses == 2
+
+
+def test_scraper_provider_splits_batches_per_page():
+    keys = [('coin', 'https://a', '.p'), ('coin', 'https://b', '.p'), ('coin', 'https://a', '.q')]
+    assert CoinScraperPriceProvider().upstream_batches(keys) == [
+        [('coin', 'https://a', '.p'), ('coin', 'https://a', '.q')],
+        [('coin', 'https://b', '.p')]
+    ]
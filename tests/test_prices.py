@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import prices
+from price_providers import PriceProvider, price_providers
+from prices import price_cache, resolve_prices, refresh_prices, add_price_listener, remove_price_listener
+
+
+def test_concurrent_lookups_make_one_provider_call(stub_providers):
+    stub_providers['crypto'].delay = 0.02
+
+    async def run():
+        return await asyncio.gather(*[resolve_prices({'btc': ('crypto', 'BTC')}) for _ in range(100)])
+
+    results = asyncio.run(run())
+    assert all(result == ({'btc': 10.0}, []) for result in results)
+    assert stub_providers['crypto'].calls == [[('crypto', 'BTC')]]
+
+
+def test_misses_are_fetched_in_one_call_per_source(stub_providers):
+    keys = {
+        'btc': ('crypto', 'BTC'),
+        'eth': ('crypto', 'ETH'),
+        'also-btc': ('crypto', 'BTC'),
+        'aapl': ('stock', 'AAPL'),
+    }
+    resolved, timed_out = asyncio.run(resolve_prices(keys))
+    assert resolved == {'btc': 10.0, 'eth': 10.0, 'also-btc': 10.0, 'aapl': 10.0}
+    assert timed_out == []
+    assert sorted(stub_providers['crypto'].calls[0]) == [('crypto', 'BTC'), ('crypto', 'ETH')]
+    assert len(stub_providers['crypto'].calls) == 1
+    assert stub_providers['stock'].calls == [[('stock', 'AAPL')]]
+    assert stub_providers['coin'].calls == []
+
+
+def test_deadline_returns_partial_results(stub_providers):
+    stub_providers['stock'].delay = 0.2
+
+    async def run():
+        result = await resolve_prices({'btc': ('crypto', 'BTC'), 'aapl': ('stock', 'AAPL')}, deadline=0.05)
+        # The cut-off lookup keeps running and lands in the cache
+        await asyncio.sleep(0.25)
+        return result
+
+    resolved, timed_out = asyncio.run(run())
+    assert resolved == {'btc': 10.0}
+    assert timed_out == ['aapl']
+    assert price_cache.get(('stock', 'AAPL')) == 10.0
+
+
+def test_cached_prices_skip_the_provider(stub_providers):
+    price_cache.set(('crypto', 'BTC'), 42.0)
+    resolved, _ = asyncio.run(resolve_prices({'btc': ('crypto', 'BTC')}))
+    assert resolved == {'btc': 42.0}
+    assert stub_providers['crypto'].calls == []
+
+
+def test_failed_batch_maps_keys_to_none(stub_providers):
+    stub_providers['crypto'].fail = True
+    resolved, timed_out = asyncio.run(resolve_prices({'btc': ('crypto', 'BTC'), 'x': ('crypto', 'UNKNOWN')}))
+    assert resolved == {'btc': None, 'x': None}
+    assert timed_out == []
+    assert len(price_cache) == 0
+
+
+def test_refresh_prices_notifies_only_changes(stub_providers):
+    changes = []
+    listener = lambda price_key, price: changes.append((price_key, price))
+    add_price_listener(listener)
+    try:
+        keys = [('crypto', 'BTC'), ('crypto', 'UNKNOWN')]
+        assert asyncio.run(refresh_prices(keys)) == {('crypto', 'BTC'): 10.0, ('crypto', 'UNKNOWN'): None}
+        asyncio.run(refresh_prices(keys))
+        stub_providers['crypto'].price = 11.0
+        asyncio.run(refresh_prices(keys))
+    finally:
+        remove_price_listener(listener)
+    assert changes == [(('crypto', 'BTC'), 10.0), (('crypto', 'BTC'), 11.0)]
+    assert price_cache.get(('crypto', 'BTC')) == 11.0
+
+
+def test_unknown_source_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(prices.fetch_price_eur(('bond', 'X')))
+
+
+def test_request_path_cache_fills_notify_listeners(stub_providers):
+    changes = []
+    listener = lambda price_key, price: changes.append((price_key, price))
+    add_price_listener(listener)
+    try:
+        asyncio.run(resolve_prices({'btc': ('crypto', 'BTC')}))
+        price_cache.clear()
+        stub_providers['crypto'].price = 15.0
+        asyncio.run(prices.get_crypto_price_eur('btc'))
+    finally:
+        remove_price_listener(listener)
+    assert changes == [(('crypto', 'BTC'), 10.0), (('crypto', 'BTC'), 15.0)]
+
+
+def test_coin_concurrency_limits_page_fetches(stub_providers, monkeypatch):
+    class PageProvider(PriceProvider):
+        active = peak = 0
+
+        def upstream_batches(self, price_keys):
+            return [[key] for key in price_keys]
+
+        async def get_prices(self, price_keys):
+            PageProvider.active += 1
+            PageProvider.peak = max(PageProvider.peak, PageProvider.active)
+            await asyncio.sleep(0.01)
+            PageProvider.active -= 1
+            return {key: 1.0 for key in price_keys}
+
+    price_providers.register('coin', PageProvider())
+    monkeypatch.setitem(prices._source_limits, 'coin', asyncio.Semaphore(3))
+    keys = {i: ('coin', f'https://example.com/{i}', '.p') for i in range(20)}
+
+    resolved, _ = asyncio.run(resolve_prices(keys))
+    assert resolved == {i: 1.0 for i in range(20)}
+    assert PageProvider.peak == 3
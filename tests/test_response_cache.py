@@ -0,0 +1,35 @@
+from starlette.requests import Request
+
+from response_cache import UserVersions, etag_matches
+
+
+def request_with(if_none_match: str) -> Request:
+    return Request({'type': 'http', 'headers': [(b'if-none-match', if_none_match.encode())]})
+
+
+def test_users_at_the_same_version_get_different_etags():
+    versions = UserVersions()
+    versions.bump('user-a', 'holdings')
+    versions.bump('user-b', 'holdings')
+    etag_a = versions.etag('user-a', 'holdings')
+    etag_b = versions.etag('user-b', 'holdings')
+
+    assert etag_a != etag_b
+    assert not etag_matches(request_with(etag_a), etag_b)
+    assert etag_matches(request_with(etag_b), etag_b)
+
+
+def test_etag_changes_with_the_version():
+    versions = UserVersions()
+    before = versions.etag('user-a', 'holdings')
+    versions.bump('user-a', 'holdings')
+    assert versions.etag('user-a', 'holdings') != before
+    assert versions.etag('user-a', 'history') != versions.etag('user-a', 'holdings')
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = '"holdings-1"'
+    assert etag_matches(request_with('W/"holdings-1"'), etag)
+    assert etag_matches(request_with('"other", W/"holdings-1"'), etag)
+    assert etag_matches(request_with('*'), etag)
+    assert not etag_matches(request_with('W/"holdings-2"'), etag)
@@ -0,0 +1,23 @@
+import asyncio
+
+import stock_prices
+from price_providers import YahooPriceProvider
+from stock_prices import StockQuoteBatcher
+
+
+def test_unknown_currency_is_not_guessed(monkeypatch):
+    monkeypatch.setattr(stock_prices, 'download_last_closes', lambda symbols: {'VOD.L': 75.0, 'AAPL': 200.0})
+    monkeypatch.setattr(stock_prices, 'lookup_currency', lambda symbol: 'USD' if symbol == 'AAPL' else None)
+    batcher = StockQuoteBatcher(window=0.01)
+
+    quotes = asyncio.run(batcher.get_quotes(['VOD.L', 'AAPL', 'MISSING']))
+    assert quotes == {'VOD.L': (75.0, None), 'AAPL': (200.0, 'USD'), 'MISSING': (None, None)}
+
+
+def test_provider_leaves_unknown_currencies_unpriced(monkeypatch):
+    async def get_quotes(symbols):
+        return {'VOD.L': (75.0, None)}
+
+    monkeypatch.setattr(stock_prices.stock_quotes, 'get_quotes', get_quotes)
+    prices = asyncio.run(YahooPriceProvider().get_prices([('stock', 'VOD.L')]))
+    assert prices == {('stock', 'VOD.L'): None}
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+import valuation
+from prices import price_cache, resolve_prices, PRICE_TTLS
+from valuation import ValuationEngine
+
+BTC = ('crypto', 'BTC')
+AAPL = ('stock', 'AAPL')
+
+
+@pytest.fixture
+def holdings(monkeypatch):
+    """Replace the database read with an in-memory list of (asset class, holding key, price key, quantity)"""
+    rows = {}
+
+    async def load_user_holdings(user_id, db):
+        return list(rows.get(user_id, []))
+
+    monkeypatch.setattr(valuation, 'load_user_holdings', load_user_holdings)
+    price_cache.clear()
+    yield rows
+    price_cache.clear()
+
+
+def test_overview_loads_holdings_and_prices(holdings):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 2.0), ('crypto', 'crypto-2', BTC, 1.0), ('stocks', 'stock-1', AAPL, 3.0)]
+    price_cache.set(BTC, 100.0)
+    price_cache.set(AAPL, 50.0)
+    engine = ValuationEngine()
+
+    overview = asyncio.run(engine.get_overview('u1', None))
+    assert overview['crypto_value_eur'] == 300.0
+    assert overview['stocks_value_eur'] == 150.0
+    assert overview['total_value_eur'] == 450.0
+    assert overview['crypto_count'] == 2
+    assert overview['timed_out'] == []
+    assert engine.stats()['price_keys'] == 2
+
+
+def test_ticks_update_every_holder(holdings):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 2.0)]
+    holdings['u2'] = [('crypto', 'crypto-2', BTC, 5.0), ('stocks', 'stock-1', AAPL, 1.0)]
+    price_cache.set(BTC, 100.0)
+    price_cache.set(AAPL, 50.0)
+    engine = ValuationEngine()
+    asyncio.run(engine.get_overview('u1', None))
+    asyncio.run(engine.get_overview('u2', None))
+
+    engine._on_price_change(BTC, 110.0)
+    assert asyncio.run(engine.get_overview('u1', None))['crypto_value_eur'] == 220.0
+    assert asyncio.run(engine.get_overview('u2', None))['total_value_eur'] == 600.0
+    assert engine.stats()['ticks_applied'] == 2
+    assert engine.stats()['loads'] == 2
+
+
+def test_add_and_remove_holdings(holdings):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 2.0)]
+    price_cache.set(BTC, 100.0)
+    price_cache.set(AAPL, 50.0)
+    engine = ValuationEngine()
+    asyncio.run(engine.get_overview('u1', None))
+
+    engine.add_holding('u1', 'crypto', 'crypto-2', BTC, 1.0)
+    engine.add_holding('u1', 'stocks', 'stock-1', AAPL, 4.0)
+    overview = asyncio.run(engine.get_overview('u1', None))
+    assert overview['crypto_value_eur'] == 300.0
+    assert overview['stocks_value_eur'] == 200.0
+    assert overview['crypto_count'] == 2
+
+    engine.remove_holding('u1', 'crypto', 'crypto-1', BTC, 2.0)
+    engine.remove_holding('u1', 'stocks', 'stock-1', AAPL, 4.0)
+    overview = asyncio.run(engine.get_overview('u1', None))
+    assert overview['total_value_eur'] == 100.0
+    assert overview['stocks_count'] == 0
+    # Positions that are gone no longer receive ticks
+    assert AAPL not in engine._holders
+    engine._on_price_change(AAPL, 60.0)
+    assert asyncio.run(engine.get_overview('u1', None))['stocks_value_eur'] == 0.0
+
+    # Removing an unknown holding changes nothing
+    engine.remove_holding('u1', 'crypto', 'crypto-9', BTC, 1.0)
+    assert asyncio.run(engine.get_overview('u1', None))['crypto_value_eur'] == 100.0
+
+
+def test_changes_for_unloaded_users_are_ignored(holdings):
+    engine = ValuationEngine()
+    engine.add_holding('u1', 'crypto', 'crypto-1', BTC, 1.0)
+    engine.remove_holding('u1', 'crypto', 'crypto-1', BTC, 1.0)
+    assert engine.stats()['users'] == 0
+
+
+def test_holding_change_during_load_discards_the_stale_portfolio(holdings, monkeypatch):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 1.0)]
+    price_cache.set(BTC, 100.0)
+    price_cache.set(AAPL, 50.0)
+    engine = ValuationEngine()
+    release = asyncio.Event()
+    unblocked = valuation.load_user_holdings
+
+    async def slow_load(user_id, db):
+        rows = await unblocked(user_id, db)
+        await release.wait()
+        return rows
+
+    monkeypatch.setattr(valuation, 'load_user_holdings', slow_load)
+
+    async def run():
+        overview = asyncio.ensure_future(engine.get_overview('u1', None))
+        await asyncio.sleep(0)
+        # The holding lands in the database after the load read it
+        holdings['u1'].append(('stocks', 'stock-1', AAPL, 2.0))
+        engine.add_holding('u1', 'stocks', 'stock-1', AAPL, 2.0)
+        release.set()
+        return await overview
+
+    first = asyncio.run(run())
+    assert first['stocks_value_eur'] == 0.0
+    assert engine.stats()['users'] == 0
+
+    monkeypatch.setattr(valuation, 'load_user_holdings', unblocked)
+    second = asyncio.run(engine.get_overview('u1', None))
+    assert second['stocks_value_eur'] == 100.0
+    assert engine.stats()['users'] == 1
+    assert engine.stats()['loads'] == 2
+
+
+def test_least_recently_read_users_are_evicted(holdings):
+    for user_id in ('u1', 'u2', 'u3'):
+        holdings[user_id] = [('crypto', f'crypto-{user_id}', BTC, 1.0)]
+    price_cache.set(BTC, 100.0)
+    engine = ValuationEngine(max_users=2)
+    for user_id in ('u1', 'u2', 'u1', 'u3'):
+        asyncio.run(engine.get_overview(user_id, None))
+
+    assert list(engine._portfolios) == ['u1', 'u3']
+    assert engine._holders[BTC] == {'u1', 'u3'}
+
+
+def test_expired_price_is_dropped_when_upstream_fails(holdings, stub_providers):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 2.0)]
+    price_cache.set(BTC, 100.0)
+    engine = ValuationEngine()
+    assert asyncio.run(engine.get_overview('u1', None))['crypto_value_eur'] == 200.0
+
+    # The cache entry expires and every refetch fails
+    price_cache.clear()
+    stub_providers['crypto'].fail = True
+    engine._portfolios['u1'].priced_at[BTC] -= PRICE_TTLS['crypto']
+    overview = asyncio.run(engine.get_overview('u1', None))
+    assert overview['crypto_value_eur'] == 0.0
+    assert overview['unpriced'] == ['crypto-1']
+    assert overview['timed_out'] == []
+
+
+def test_fresh_prices_are_not_looked_up_again(holdings, stub_providers):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 1.0)]
+    engine = ValuationEngine()
+    asyncio.run(engine.get_overview('u1', None))
+    price_cache.clear()
+    asyncio.run(engine.get_overview('u1', None))
+    assert len(stub_providers['crypto'].calls) == 1
+
+
+def test_request_path_cache_fills_reach_the_engine(holdings, stub_providers):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 1.0)]
+    price_cache.set(BTC, 100.0)
+    engine = ValuationEngine()
+    engine.start()
+    try:
+        asyncio.run(engine.get_overview('u1', None))
+        # Another request path refills the expired cache entry with a new price
+        price_cache.clear()
+        stub_providers['crypto'].price = 150.0
+        asyncio.run(resolve_prices({BTC: BTC}))
+        assert asyncio.run(engine.get_overview('u1', None))['crypto_value_eur'] == 150.0
+    finally:
+        engine.stop()
+
+
+def test_stale_engine_price_is_reread_from_the_cache(holdings):
+    holdings['u1'] = [('crypto', 'crypto-1', BTC, 1.0)]
+    price_cache.set(BTC, 100.0)
+    engine = ValuationEngine()
+    asyncio.run(engine.get_overview('u1', None))
+
+    # The cache moved on without the engine being told
+    price_cache.set(BTC, 150.0)
+    engine._portfolios['u1'].priced_at[BTC] -= PRICE_TTLS['crypto']
+    assert asyncio.run(engine.get_overview('u1', None))['crypto_value_eur'] == 150.0